@@ -1,29 +1,30 @@
-from flask import Flask, render_template, redirect, url_for, session, request, flash
+from flask import Flask, render_template, redirect, url_for, session, request, flash, jsonify
 import sqlite3
 from datetime import date, datetime
 import os
-import json
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-# ----- Import des mini-apps -----
-from certificate_work.app import app as work_certificate_app
-from job_application_app.app import app as job_application_app
-from project_intership.app import app as project_internship_app
-from project2.app import app as project2_app
-from projects.app import app as projects_app
+import contact_journal
+import db
+import downloads
+import export_cache
+import export_jobs
+import logos
+import passwords
+import render_pool
+import retention
+import rollups
+from db import get_db
+from hll import visitor_key
+from lazy_dispatch import lazy_dispatcher
+from visits import VisitCounter, init as init_visitor_sketches
 
 # ================= FLASK PRINCIPAL =================
 app = Flask(__name__)
 app.secret_key = "LETTRIX_SECRET_KEY"
 
-DB_NAME = "database.db"
-
 # ================= DATABASE =================
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+# connexions gérées par db.py (une par thread, WAL, rendue en fin de contexte)
+db.init_app(app)
 
 def init_db():
     conn = get_db()
@@ -50,27 +51,33 @@ def init_db():
             count INTEGER DEFAULT 1
         )
     """)
+    rollups.init(cur)
+    init_visitor_sketches(cur)
+    logos.init(cur)
+    export_jobs.init(cur)
+    # liste paginée des commentaires : le curseur est l'id (= rowid), déjà
+    # la clé de la table ; l'ancien index couvrant ne servait à rien
+    cur.execute("DROP INDEX IF EXISTS idx_comments_listing")
     conn.commit()
-    conn.close()
+    rollups.ensure_built(conn)
 
 init_db()
 
 # ================= VISITORS COUNTER =================
+# compteur write-behind : flush en lot (timer / N hits / arrêt du worker)
+visit_counter = VisitCounter(db.connect).start()
+
 @app.before_request
 def count_visits():
-    today = date.today().isoformat()
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT count FROM visits WHERE visit_date = ?", (today,))
-    row = cur.fetchone()
-    if row:
-        cur.execute("UPDATE visits SET count = count + 1 WHERE visit_date = ?", (today,))
-    else:
-        cur.execute("INSERT INTO visits (visit_date, count) VALUES (?, 1)", (today,))
-    conn.commit()
-    conn.close()
+    ip = request.headers.get("X-Forwarded-For", request.remote_addr or "").split(",")[0].strip()
+    visit_counter.hit(visitor=visitor_key(ip, request.headers.get("User-Agent", "")))
 
 # ================= AUTH =================
+# hachage dans un pool de process borné ; saturé -> 429 immédiat
+@app.errorhandler(passwords.HashingBusy)
+def hashing_busy(e):
+    return "Too many login attempts, please retry shortly.", 429, {"Retry-After": "2"}
+
 @app.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
@@ -79,20 +86,20 @@ def register():
         if not username or not password:
             flash("Missing fields")
             return redirect(url_for("register"))
+        password_hash = passwords.hash_password(password)
         conn = get_db()
         cur = conn.cursor()
         try:
             cur.execute(
                 "INSERT INTO users (username, password) VALUES (?, ?)",
-                (username, generate_password_hash(password))
+                (username, password_hash)
             )
             conn.commit()
             flash("Account created. Please login.")
             return redirect(url_for("login"))
         except sqlite3.IntegrityError:
+            conn.rollback()
             flash("Username already exists")
-        finally:
-            conn.close()
     return render_template("register.html")
 
 @app.route("/login", methods=["GET", "POST"])
@@ -104,8 +111,17 @@ def login():
         cur = conn.cursor()
         cur.execute("SELECT * FROM users WHERE username = ?", (username,))
         user = cur.fetchone()
-        conn.close()
-        if user and check_password_hash(user["password"], password):
+        if user and password and passwords.verify_password(user["password"], password):
+            # profil de coût modifié depuis l'inscription : on rehache
+            if passwords.needs_rehash(user["password"]):
+                try:
+                    cur.execute(
+                        "UPDATE users SET password = ? WHERE id = ?",
+                        (passwords.hash_password(password), user["id"])
+                    )
+                    conn.commit()
+                except passwords.HashingBusy:
+                    pass
             session["user_id"] = user["id"]
             session["is_admin"] = user["is_admin"]
             flash("Login successful")
@@ -126,9 +142,9 @@ def home():
     cur = conn.cursor()
     cur.execute("SELECT count FROM visits WHERE visit_date = ?", (date.today().isoformat(),))
     row = cur.fetchone()
-    visitors_today = row["count"] if row else 0
-    conn.close()
-    return render_template("home.html", visitors_today=visitors_today)
+    visitors_today = visit_counter.today(row["count"] if row else 0)
+    unique_today = visit_counter.unique(conn)
+    return render_template("home.html", visitors_today=visitors_today, unique_today=unique_today)
 
 # ================= MINI APPS via DispatcherMiddleware =================
 @app.route("/open/<appname>")
@@ -150,6 +166,31 @@ def can_export():
     return "YES"
 
 # ================= COMMENTS =================
+COMMENTS_PAGE_SIZE = 20
+COMMENTS_MAX_PAGE_SIZE = 100
+
+def fetch_comments_page(before=None, limit=COMMENTS_PAGE_SIZE):
+    # pagination par curseur (keyset) : coût constant quelle que soit la taille de la table
+    cur = get_db().cursor()
+    if before:
+        cur.execute(
+            "SELECT id, name, message, created_at FROM comments WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (before, limit + 1)
+        )
+    else:
+        cur.execute(
+            "SELECT id, name, message, created_at FROM comments ORDER BY id DESC LIMIT ?",
+            (limit + 1,)
+        )
+    rows = cur.fetchall()
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def page_args():
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", COMMENTS_PAGE_SIZE, type=int)
+    return before, max(1, min(limit, COMMENTS_MAX_PAGE_SIZE))
+
 @app.route("/comments", methods=["GET", "POST"])
 def comments():
     conn = get_db()
@@ -162,14 +203,42 @@ def comments():
                 "INSERT INTO comments (name, message, created_at) VALUES (?, ?, ?)",
                 (name, message, datetime.now().strftime("%Y-%m-%d %H:%M"))
             )
+            rollups.incr(conn, "comments")
             conn.commit()
             return redirect(url_for("comments"))
-    cur.execute("SELECT * FROM comments ORDER BY id DESC")
-    comments_list = cur.fetchall()
-    conn.close()
-    return render_template("comments.html", comments=comments_list)
+    before, limit = page_args()
+    comments_list, next_cursor = fetch_comments_page(before, limit)
+    return render_template(
+        "comments.html",
+        comments=comments_list,
+        next_cursor=next_cursor,
+        limit=limit
+    )
+
+@app.route("/comments.json")
+def comments_json():
+    before, limit = page_args()
+    rows, next_cursor = fetch_comments_page(before, limit)
+    return jsonify({
+        "comments": [dict(row) for row in rows],
+        "next_cursor": next_cursor
+    })
 
 # ================= CONTACT =================
+# tâches de fond du process web uniquement : un enfant spawn (pool de
+# hachage, de rendu, file d'exports) ré-importe app.py en __mp_main__ et
+# ne doit ni relancer de process ni dupliquer les threads de ménage
+if __name__ != "__mp_main__":
+    # journal JSONL en ajout seul ; data/messages.json reste lu tel quel
+    # jusqu'à "python contact_journal.py migrate" (jamais à l'import)
+    contact_journal.start_compactor()
+    logos.start_gc()
+    # ménage de export/pdf et export/word (âge + quota, voir retention.py)
+    retention.start_janitor()
+    # process de rendu PDF démarrés d'avance (no-op si LETTRIX_RENDER_WORKERS=0)
+    render_pool.warm()
+# file des exports asynchrones : process lancés au premier job (export_jobs.submit)
+
 @app.route("/contact", methods=["GET", "POST"])
 def contact():
     if request.method == "POST":
@@ -179,15 +248,7 @@ def contact():
             "message": request.form.get("message"),
             "date": datetime.now().strftime("%Y-%m-%d %H:%M")
         }
-        os.makedirs("data", exist_ok=True)
-        path = "data/messages.json"
-        messages = []
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                messages = json.load(f)
-        messages.append(new_message)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(messages, f, indent=2, ensure_ascii=False)
+        contact_journal.append(new_message)
         flash("Your message has been sent successfully.")
     return render_template("contact.html")
 
@@ -198,14 +259,46 @@ def admin():
         return redirect(url_for("login"))
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("SELECT visit_date, count FROM visits ORDER BY visit_date")
-    visits = cur.fetchall()
-    cur.execute("SELECT COUNT(*) as total FROM comments")
-    comments_count = cur.fetchone()["total"]
+
+    # ----- visites servies par les rollups (plage de dates optionnelle) -----
+    granularity = request.args.get("granularity", "day")
+    if granularity not in rollups.GRANULARITIES:
+        granularity = "day"
+    start, end = rollups.default_range(granularity)
+    start = request.args.get("from") or start
+    end = request.args.get("to") or end
+    try:
+        date.fromisoformat(start)
+        date.fromisoformat(end)
+    except ValueError:
+        flash("Invalid date range")
+        start, end = rollups.default_range(granularity)
+    visits = visit_counter.merge(
+        rollups.query(conn, granularity, start, end),
+        granularity, start, end
+    )
+    comments_count = rollups.counter(conn, "comments")
+    unique_today = visit_counter.unique(conn)
     cur.execute("SELECT name, message, created_at FROM comments ORDER BY id DESC LIMIT 10")
     comments = cur.fetchall()
-    conn.close()
-    return render_template("admin.html", visits=visits, comments_count=comments_count, comments=comments)
+    messages_offset = max(0, request.args.get("messages_offset", 0, type=int))
+    messages, messages_next = contact_journal.read_page(messages_offset, 10)
+    return render_template(
+        "admin.html",
+        visits=visits,
+        granularity=granularity,
+        range_start=start,
+        range_end=end,
+        comments_count=comments_count,
+        unique_today=unique_today,
+        comments=comments,
+        messages=messages,
+        messages_next=messages_next,
+        db_stats=db.stats(),
+        export_cache_stats=export_cache.stats(),
+        pdf_compact_stats=downloads.stats(),
+        retention_stats=retention.stats(),
+    )
 
 # ================= STATIC PAGES =================
 @app.route("/about")
@@ -224,14 +317,15 @@ def terms():
 print("static trouvés :", os.listdir("static"))
 
 # ================= DISPATCHER POUR RENDER =================
-application = DispatcherMiddleware(
+# mini-apps importées à la première requête (voir LETTRIX_WARM_MOUNTS)
+application = lazy_dispatcher(
     app,
     {
-        "/work_certificate": work_certificate_app,
-        "/job_application": job_application_app,
-        "/project_internship": project_internship_app,
-        "/project2": project2_app,
-        "/projects": projects_app,
+        "/work_certificate": "certificate_work.app:app",
+        "/job_application": "job_application_app.app:app",
+        "/project_internship": "project_intership.app:app",
+        "/project2": "project2.app:app",
+        "/projects": "projects.app:app",
     }
 )
 
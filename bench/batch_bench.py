@@ -0,0 +1,116 @@
+import io
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastpdf
+from fastpdf_bench import META, TEXT, make_logo, marks
+
+# ================= BENCHMARK : lot de lettres dans un seul PDF =================
+# N lettres d'un même type (logo commun, texte et destinataire propres à
+# chacune) : N exports simples contre un export_batch_pdf. Vérifie aussi
+# que chaque page du lot dessine exactement la lettre exportée seule
+# (voir fastpdf_bench.marks), qu'il y a un signet par lettre, et qu'une
+# lettre trop longue (repli doc.build) ne décale pas les suivantes.
+#   python bench/batch_bench.py [n]
+
+NAMES = ("employee_name", "applicant_name", "employee_full_name")
+
+
+def exporters():
+    from certificate_work import utils as certificate
+    from job_application_app import utils as job_application
+    from project2 import utils as leave
+    from project_intership import utils as internship
+    from projects import util as resignation
+
+    return [
+        ("certificate", certificate.export_to_pdf, certificate.export_batch_pdf),
+        ("job_application", job_application.export_to_pdf, job_application.export_batch_pdf),
+        ("leave", leave.export_leave_pdf, leave.export_leave_batch_pdf),
+        ("internship", internship.export_to_pdf, internship.export_batch_pdf),
+        ("resignation", resignation.export_to_pdf, resignation.export_batch_pdf),
+    ]
+
+
+def team(n, logo, long_at=None):
+    letters = []
+    for i in range(n):
+        name = f"Employee {i:03d}"
+        meta = dict(META, company_logo=logo, company_logo_path=logo)
+        meta.update({field: name for field in NAMES})
+        text = TEXT.replace("three years", f"{i % 9 + 2} years").replace("team", f"team of {i + 2}")
+        if i == long_at:
+            text = "\n\n".join([text] * 6)
+        letters.append((text, meta))
+    return letters
+
+
+def render(func, *args):
+    out = io.BytesIO()
+    func(*args, output=out)
+    return out.getvalue()
+
+
+def pages(data):
+    return len(re.findall(rb"/Type /Page\b(?!s)", data))
+
+
+def check(name, single, batch, letters):
+    # -> None ou description du premier écart
+    from reportlab import rl_config
+
+    rl_config.pageCompression = 0
+    try:
+        merged = render(batch, letters)
+        alone = [render(single, text, meta) for text, meta in letters]
+    finally:
+        rl_config.pageCompression = 1
+    first = 0
+    for i, data in enumerate(alone):
+        for p in range(pages(data)):
+            if marks(merged, first + p) != marks(data, p):
+                return f"letter {i} page {p} differs"
+        first += pages(data)
+    if pages(merged) != first:
+        return "page count differs"
+    if len(re.findall(rb"/Dest \[", merged)) != len(letters):
+        return "missing bookmarks"
+    return None
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logo = make_logo(tempfile.mkdtemp())
+    letters = team(n, logo)
+    failures = 0
+
+    print(f"{'letter':<16}{'single':>10}{'batch/letter':>14}{'speedup':>9}{'bytes/letter':>14}  check")
+    for name, single, batch in exporters():
+        render(single, *letters[0])
+        one = timeit.timeit(lambda: [render(single, *l) for l in letters[:10]], number=3) / 30
+        many = timeit.timeit(lambda: render(batch, letters), number=3) / 3 / n
+        size = len(render(batch, letters)) / n
+
+        problem = check(name, single, batch, letters[:5])
+        fastpdf.ENABLED = False
+        problem = problem or check(name, single, batch, letters[:5])
+        fastpdf.ENABLED = True
+        long_problem = check(name, single, batch, team(4, logo, long_at=1))
+        status = "ok"
+        if problem or long_problem:
+            failures += 1
+            status = problem or ("overflow: " + long_problem)
+        print(f"{name:<16}{one * 1000:8.2f}ms{many * 1000:12.2f}ms{one / many:8.1f}x"
+              f"{size:>14.0f}  {status}")
+
+    print("\nfastpdf stats:", fastpdf.stats())
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dates
+
+# ================= MICROBENCHMARK : pretty_date =================
+# ancienne boucle strptime (copiée des générateurs) vs dates.pretty_date
+#   python bench/dates_bench.py [n]
+
+VALUES = [
+    "2025-12-20", "20/12/2025", "20-12-2025", "2025/12/20",
+    "2026-01-09", "not a date", "", "2024-02-29",
+]
+
+
+def legacy_pretty_date(s):
+    if not s:
+        return ""
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(s, fmt).strftime("%B %d, %Y")
+        except:
+            continue
+    return s
+
+
+def check():
+    for v in VALUES:
+        assert dates.pretty_date(v) == legacy_pretty_date(v), v
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    check()
+
+    legacy = timeit.timeit(lambda: [legacy_pretty_date(v) for v in VALUES], number=n)
+    cold = timeit.timeit(
+        lambda: [dates._pretty.cache_clear(), [dates.pretty_date(v) for v in VALUES]], number=n
+    )
+    warm = timeit.timeit(lambda: [dates.pretty_date(v) for v in VALUES], number=n)
+
+    calls = n * len(VALUES)
+    print(f"{calls} calls, mixed formats")
+    print(f"legacy strptime loop : {legacy / calls * 1e6:7.2f} us/call")
+    print(f"fast path (no memo)  : {cold / calls * 1e6:7.2f} us/call  x{legacy / cold:.1f}")
+    print(f"fast path (memo hit) : {warm / calls * 1e6:7.2f} us/call  x{legacy / warm:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import io
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastpdf
+
+# ================= BENCHMARK : rendu direct vs doc.build =================
+# Les cinq lettres sont rendues deux fois : fastpdf (canvas direct) et
+# doc.build() platypus (LETTRIX_FAST_PDF=0, le rendu d'avant). Le rendu
+# visuel est comparé sur les flux de page non compressés : chaque texte
+# (position, police, taille, couleur, espacement des mots), chaque trait
+# et chaque image / form XObject doit être au même endroit à 0.01 pt près.
+#   python bench/fastpdf_bench.py [n]
+
+TEXT = (
+    "I am writing to you regarding the position we discussed last week. "
+    "During the past three years I have worked on customer projects, "
+    "written technical documentation and coordinated a small team of "
+    "developers across two sites.\n\n"
+    "I would welcome the opportunity to bring this experience to your "
+    "company, where rigour and attention to detail are valued.\n"
+    "I remain available for an interview at your convenience.\n\n"
+    "Please accept my best regards."
+)
+
+META = {
+    "company_name": "Lettrix Industries",
+    "company_address": "12 rue de la Paix, 75002 Paris",
+    "company_email": "contact@lettrix.example",
+    "company_phone": "+33 1 23 45 67 89",
+    "email": "contact@lettrix.example",
+    "phone": "+33 1 23 45 67 89",
+    "employee_name": "Camille Martin",
+    "applicant_name": "Camille Martin",
+    "position": "Software engineer",
+    "department": "R&D",
+    "contract_type": "Permanent",
+    "start_date": "March 1, 2021",
+    "end_date": "June 30, 2025",
+    "signer_name": "Alex Durand",
+    "signer_role": "HR Manager",
+    "signature_place": "Paris",
+    "signature_date": "July 1, 2025",
+}
+
+
+def letters():
+    from certificate_work import utils as certificate
+    from job_application_app import utils as job_application
+    from project2 import utils as leave
+    from project_intership import utils as internship
+    from projects import util as resignation
+
+    return [
+        ("certificate", certificate.export_to_pdf),
+        ("job_application", job_application.export_to_pdf),
+        ("leave", leave.export_leave_pdf),
+        ("internship", internship.export_to_pdf),
+        ("resignation", resignation.export_to_pdf),
+    ]
+
+
+def make_logo(directory):
+    # -> nom du logo dans un store temporaire (les exporteurs ne lisent que le store)
+    from PIL import Image
+
+    return store_logo(directory, Image.new("RGB", (300, 200), (13, 110, 253)), "PNG")
+
+
+def store_logo(directory, image, fmt):
+    import hashlib
+
+    import logos
+
+    out = io.BytesIO()
+    image.save(out, fmt, quality=90)
+    data = out.getvalue()
+    logos.STORE_DIR = directory
+    name = f"{hashlib.sha256(data).hexdigest()}.{'jpg' if fmt == 'JPEG' else 'png'}"
+    logos._save(logos.object_path(name), data, image.width, image.height)
+    return name
+
+
+def render(func, text, meta, fast):
+    fastpdf.ENABLED = fast
+    out = io.BytesIO()
+    func(text, dict(meta), output=out)
+    return out.getvalue()
+
+
+# ----- lecture des flux de page (sortie ReportLab non compressée) -----
+_OBJ = re.compile(rb"(\d+) 0 obj\s*(.*?)endobj", re.S)
+_TOKEN = re.compile(
+    rb"\((?:\\.|[^\\)])*\)|\[|\]|/[^\s/\[\]()<>]+|[-+]?\d*\.?\d+|[A-Za-z'\"*]+"
+)
+
+
+def _objects(data):
+    return {int(m.group(1)): m.group(2) for m in _OBJ.finditer(data)}
+
+
+def _string(token):
+    s = token[1:-1]
+    return re.sub(rb"\\(.)", lambda m: m.group(1), s).decode("latin-1")
+
+
+def _mul(a, b):
+    return [
+        a[0] * b[0] + a[1] * b[2], a[0] * b[1] + a[1] * b[3],
+        a[2] * b[0] + a[3] * b[2], a[2] * b[1] + a[3] * b[3],
+        a[4] * b[0] + a[5] * b[2] + b[4], a[4] * b[1] + a[5] * b[3] + b[5],
+    ]
+
+
+def _point(m, x=0.0, y=0.0):
+    return round(x * m[0] + y * m[2] + m[4], 2), round(x * m[1] + y * m[3] + m[5], 2)
+
+
+def marks(data, page=0):
+    # -> liste triée de ce qui est dessiné sur la page (1re par défaut)
+    objects = _objects(data)
+    fonts = {}
+    for body in objects.values():
+        m = re.search(rb"/BaseFont /(\S+).*?/Name /(\S+)", body, re.S)
+        if m:
+            fonts[m.group(2)] = m.group(1).decode()
+    pages = [b for _, b in sorted(objects.items()) if re.search(rb"/Type /Page\b(?!s)", b)]
+    contents = int(re.search(rb"/Contents (\d+) 0 R", pages[page]).group(1))
+    stream = objects[contents].split(b"stream", 1)[1].rsplit(b"endstream", 1)[0]
+
+    out = []
+    ctm, stack = [1, 0, 0, 1, 0, 0], []
+    tm = [1, 0, 0, 1, 0, 0]
+    font, size, leading, word_space, fill, args, path = None, 0, 0, 0, (), [], []
+    for token in _TOKEN.findall(stream):
+        if token[:1] in b"(/[]" or re.match(rb"[-+.\d]", token):
+            args.append(token)
+            continue
+        op = token.decode()
+        nums = []
+        for a in args:
+            try:
+                nums.append(float(a))
+            except ValueError:
+                pass
+        if op == "q":
+            stack.append((ctm, fill))
+        elif op == "Q":
+            ctm, fill = stack.pop()
+        elif op == "cm":
+            ctm = _mul(nums, ctm)
+        elif op == "BT":
+            tm = [1, 0, 0, 1, 0, 0]
+        elif op == "Tm":
+            tm = nums
+        elif op == "Td":
+            tm = _mul([1, 0, 0, 1, nums[0], nums[1]], tm)
+        elif op == "TL":
+            leading = nums[0]
+        elif op == "T*":
+            tm = _mul([1, 0, 0, 1, 0, -leading], tm)
+        elif op == "Tf":
+            font, size = fonts.get(args[0][1:], args[0].decode()), nums[-1]
+        elif op == "Tw":
+            word_space = round(nums[0], 3)
+        elif op in ("rg", "g", "k"):
+            fill = tuple(round(n, 3) for n in nums)
+        elif op == "Tj":
+            x, y = _point(_mul(tm, ctm))
+            out.append(("text", x, y, font, size, fill, word_space, _string(args[-1])))
+        elif op in ("m", "l"):
+            path.append(_point(ctm, *nums))
+        elif op == "S":
+            out.append(("line", tuple(path)))
+            path = []
+        elif op == "n":
+            path = []
+        elif op == "Do":
+            name = args[0].decode().split(".")[-1]
+            out.append(("draw", name.split("_")[0], _point(ctm), _point(ctm, 1, 1)))
+        args = []
+    return sorted(out, key=repr)
+
+
+def compare(fast, slow):
+    a, b = marks(fast), marks(slow)
+    if a == b:
+        return None
+    for x, y in zip(a, b):
+        if x != y:
+            return f"{x} != {y}"
+    return f"{len(a)} marks != {len(b)} marks"
+
+
+def run(label, meta, n):
+    from reportlab import rl_config
+
+    long_text = "\n\n".join([TEXT] * 6)   # déborde : repli doc.build
+    print(f"\n{label:<16}{'platypus':>11}{'fast':>11}{'speedup':>9}  visual")
+    total_slow = total_fast = 0.0
+    failures = 0
+    for name, func in letters():
+        # comparaison sur les flux de page en clair
+        rl_config.pageCompression = 0
+        diff = compare(render(func, TEXT, meta, True), render(func, TEXT, meta, False))
+        overflow = compare(
+            render(func, long_text, meta, True), render(func, long_text, meta, False)
+        )
+        rl_config.pageCompression = 1
+
+        render(func, TEXT, meta, True)
+        slow = timeit.timeit(lambda: render(func, TEXT, meta, False), number=n) / n
+        fast = timeit.timeit(lambda: render(func, TEXT, meta, True), number=n) / n
+        total_slow += slow
+        total_fast += fast
+        status = "identical" if diff is None else "DIFF " + diff
+        if overflow is not None:
+            status += " / overflow DIFF " + overflow
+        failures += diff is not None or overflow is not None
+        print(f"{name:<16}{slow * 1000:9.2f}ms{fast * 1000:9.2f}ms{slow / fast:8.1f}x  {status}")
+
+    print(f"{'all five':<16}{total_slow * 1000:9.2f}ms{total_fast * 1000:9.2f}ms"
+          f"{total_slow / total_fast:8.1f}x")
+    return failures
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with_logo = dict(META)
+    with_logo["company_logo"] = with_logo["company_logo_path"] = make_logo(tempfile.mkdtemp())
+
+    failures = run("no logo", META, n) + run("with logo", with_logo, n)
+    fastpdf.ENABLED = True
+    print("\nfastpdf stats:", fastpdf.stats())
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+# ================= IMPORT-TIME BUDGET =================
+# Lance "python -X importtime -c 'import app'" et échoue (code 1) si
+# l'import dépasse le budget ou charge un moteur de rendu (ReportLab,
+# python-docx, Pillow), qui ne doit arriver qu'au premier export.
+#
+#   python bench/import_budget.py [budget_ms] [module ...]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUDGET_MS = float(os.environ.get("LETTRIX_IMPORT_BUDGET_MS", "600"))
+FORBIDDEN = ("reportlab", "docx", "PIL")
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def check(module, budget_ms):
+    rows = measure(module)
+    # le module mesuré est la dernière entrée de niveau 0, ses imports directs le précèdent
+    end = max(i for i, r in enumerate(rows) if r[3] == 0 and r[0] == module)
+    start = max([i + 1 for i, r in enumerate(rows[:end]) if r[3] == 0] or [0])
+    top = [r for r in rows[start:end] if r[3] == 1]
+    total_ms = rows[end][2] / 1000
+    heavy = sorted({r[0].split(".")[0] for r in rows if r[0].split(".")[0] in FORBIDDEN})
+
+    print(f"import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    for name, _, cumulative_us, _ in sorted(top, key=lambda r: -r[2])[:10]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    if total_ms > budget_ms:
+        print(f"FAIL: import {module} over budget")
+        ok = False
+    if heavy:
+        print(f"FAIL: import {module} loads renderers: {', '.join(heavy)}")
+        ok = False
+    return ok
+
+
+def main():
+    args = sys.argv[1:]
+    budget = BUDGET_MS
+    if args and args[0].replace(".", "", 1).isdigit():
+        budget = float(args.pop(0))
+    modules = args or ["app"]
+    results = [check(m, budget) for m in modules]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+
+# ================= MICROBENCHMARK : HASHES / SEC / CORE =================
+# python bench/passwords_bench.py [method] [n]
+
+
+def run_serial(method, n):
+    t = time.perf_counter()
+    for i in range(n):
+        generate_password_hash(f"password{i}", method)
+    return n / (time.perf_counter() - t)
+
+
+def run_pool(method, n, workers):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # chauffe : démarrage des process hors mesure
+        list(pool.map(generate_password_hash, ["warmup"] * workers, [method] * workers))
+        t = time.perf_counter()
+        list(pool.map(generate_password_hash, [f"password{i}" for i in range(n)], [method] * n))
+        return n / (time.perf_counter() - t)
+
+
+def main():
+    method = sys.argv[1] if len(sys.argv) > 1 else passwords.HASH_METHOD
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    cores = os.cpu_count() or 1
+
+    serial = run_serial(method, n)
+    pooled = run_pool(method, n * cores, cores)
+
+    print(f"method          : {method}")
+    print(f"cores           : {cores}")
+    print(f"serial          : {serial:8.1f} hashes/sec")
+    print(f"pool ({cores:2d} procs) : {pooled:8.1f} hashes/sec")
+    print(f"per core        : {pooled / cores:8.1f} hashes/sec")
+
+
+if __name__ == "__main__":
+    main()
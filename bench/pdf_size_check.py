@@ -0,0 +1,94 @@
+import io
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastpdf_bench import META, TEXT, letters, marks, store_logo
+
+# ================= CHECK : taille des PDF compacts =================
+# Chaque type de lettre est rendu sans logo, puis avec deux grands logos
+# "hérités" (1600x1200, jamais normalisés) : un dessin PNG et une photo
+# JPEG, en mode normal et en mode compact (compact=1). Échec (code 1) si :
+#   - le PDF compact dépasse la borne de son type de lettre
+#   - il est plus gros que le PDF normal (plus petit dès qu'il y a un logo)
+#   - la page dessinée diffère (mêmes textes, traits et images aux mêmes places)
+#   python bench/pdf_size_check.py
+
+SCENARIOS = ("none", "png", "jpg")
+# octets max du PDF compact, par scénario
+BOUNDS = {
+    "certificate": (3200, 10500, 10000),
+    "job_application": (2900, 10500, 10000),
+    "leave": (2750, 10500, 10000),
+    "internship": (3350, 10500, 10000),
+    "resignation": (2800, 10500, 10000),
+}
+
+
+def make_logos(directory):
+    from PIL import Image, ImageDraw, ImageFilter
+
+    drawing = Image.linear_gradient("L").resize((1600, 1200)).convert("RGB")
+    draw = ImageDraw.Draw(drawing)
+    for i in range(12):
+        draw.ellipse((i * 120, i * 80, i * 120 + 400, i * 80 + 300),
+                     outline=(13, 110, 253), width=18)
+    draw.rectangle((200, 900, 1400, 1100), fill=(244, 180, 0))
+
+    # texture aléatoire (graine fixe) adoucie : compressible comme une photo
+    noise = random.Random(0).randbytes(1600 * 1200 * 3)
+    photo = Image.frombytes("RGB", (1600, 1200), noise).filter(ImageFilter.GaussianBlur(3))
+    photo = Image.blend(photo, drawing, 0.5)
+    # placés tels quels dans un store temporaire (sans passer par normalize)
+    return {"none": None, "png": store_logo(directory, drawing, "PNG"),
+            "jpg": store_logo(directory, photo, "JPEG")}
+
+
+def drawn(data):
+    # ce qui est dessiné, sans le nom des images (hash de leurs octets)
+    return [m[:1] + m[2:] if m[0] == "draw" else m for m in marks(data)]
+
+
+def render(func, meta, compact):
+    out = io.BytesIO()
+    func(TEXT, dict(meta, compact="1" if compact else "0"), output=out)
+    return out.getvalue()
+
+
+def main():
+    from reportlab import rl_config
+
+    logos = make_logos(tempfile.mkdtemp())
+    failures = 0
+    print(f"{'letter':<16}{'logo':<6}{'normal':>10}{'compact':>10}{'bound':>8}")
+    for name, func in letters():
+        for scenario, bound in zip(SCENARIOS, BOUNDS[name]):
+            meta = dict(META)
+            if logos[scenario]:
+                meta["company_logo"] = meta["company_logo_path"] = logos[scenario]
+            normal, compact = render(func, meta, False), render(func, meta, True)
+
+            # comparaison sur les flux de page en clair
+            rl_config.pageCompression = 0
+            same_page = drawn(render(func, meta, False)) == drawn(render(func, meta, True))
+            rl_config.pageCompression = 1
+
+            problems = []
+            if len(compact) > bound:
+                problems.append("over bound")
+            if len(compact) > len(normal) or (logos[scenario] and len(compact) == len(normal)):
+                problems.append("not smaller")
+            if not same_page:
+                problems.append("page content changed")
+            failures += bool(problems)
+            print(f"{name:<16}{scenario:<6}{len(normal):>10}"
+                  f"{len(compact):>10}{bound:>8}  {', '.join(problems) or 'ok'}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
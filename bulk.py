@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import re
+import zipfile
+
+from flask import Response, request, stream_with_context
+
+from downloads import pooled, send_export
+
+# ================= BULK LETTER GENERATION =================
+# Une ligne CSV / JSONL = une lettre. Les lignes sont lues à la volée,
+# chaque document est rendu en mémoire puis écrit dans un ZIP envoyé en
+# streaming : rien n'est écrit dans export/ et la mémoire ne dépend pas
+# du nombre de lignes (un seul document à la fois).
+#
+# format=merged : toutes les lignes dans un seul PDF (une lettre par page,
+# un signet par destinataire, outline=0 pour s'en passer), rendu en une
+# passe par l'export_batch_pdf de la mini-app. Le fichier est validé en
+# entier avant le rendu : une ligne invalide et rien n'est produit.
+
+MAX_ROWS = 500
+MERGED = "merged"
+
+# champs jamais acceptés depuis un fichier (chemins disque des logos)
+DROPPED_FIELDS = ("company_logo", "company_logo_path")
+
+EXTENSIONS = {"pdf": "pdf", "word": "docx", "docx": "docx"}
+
+
+class BulkError(ValueError):
+    pass
+
+
+def _clean(row):
+    row = {str(k).strip(): ("" if v is None else str(v)) for k, v in row.items() if k}
+    for key in DROPPED_FIELDS:
+        row.pop(key, None)
+    return row
+
+
+def check_upload(upload):
+    name = (upload.filename or "").lower() if upload else ""
+    if not name.endswith((".csv", ".jsonl", ".ndjson")):
+        raise BulkError("upload a .csv or .jsonl file")
+
+
+def iter_rows(filename, raw):
+    name = (filename or "").lower()
+    stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    try:
+        if name.endswith(".csv"):
+            for row in csv.DictReader(stream):
+                yield _clean(row)
+        elif name.endswith((".jsonl", ".ndjson")):
+            for n, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    raise BulkError(f"line {n}: invalid JSON")
+                if not isinstance(row, dict):
+                    raise BulkError(f"line {n}: expected an object")
+                yield _clean(row)
+        else:
+            raise BulkError("upload a .csv or .jsonl file")
+    finally:
+        stream.close()
+
+
+def safe_name(value, fallback):
+    value = re.sub(r"[^A-Za-z0-9_-]+", "_", value or "").strip("_")
+    return value[:60] or fallback
+
+
+# ----- ZIP en streaming (flux non "seekable" -> descripteurs de données) -----
+class _ChunkBuffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries):
+    buf = _ChunkBuffer()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+            chunk = buf.drain()
+            if chunk:
+                yield chunk
+    yield buf.drain()
+
+
+def render_entries(rows, render_row, fmt, prefix, name_field, validate=None):
+    ext = EXTENSIONS[fmt]
+    errors = []
+    rows = iter(rows)
+    n = 0
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        except (BulkError, UnicodeDecodeError, csv.Error) as e:
+            errors.append(f"input: {e}")
+            break
+        n += 1
+        if n > MAX_ROWS:
+            errors.append(f"rows after {MAX_ROWS} ignored")
+            break
+        try:
+            missing = validate(row) if validate else []
+            if missing:
+                raise BulkError(f"missing fields: {', '.join(missing)}")
+            data = render_row(row, fmt)
+        except BulkError as e:
+            errors.append(f"row {n}: {e}")
+            continue
+        except Exception as e:
+            errors.append(f"row {n}: render failed ({e})")
+            continue
+        yield f"{n:04d}_{prefix}_{safe_name(row.get(name_field), 'letter')}.{ext}", data
+    if errors:
+        yield "errors.txt", "\n".join(errors).encode("utf-8")
+
+
+def collect_letters(rows, text_of, validate=None):
+    # -> [(texte, ligne)] ; lève BulkError (5 premières erreurs) si une ligne échoue
+    letters, errors = [], []
+    rows = iter(rows)
+    n = 0
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        except (BulkError, UnicodeDecodeError, csv.Error) as e:
+            errors.append(f"input: {e}")
+            break
+        n += 1
+        if n > MAX_ROWS:
+            errors.append(f"more than {MAX_ROWS} rows")
+            break
+        try:
+            missing = validate(row) if validate else []
+            if missing:
+                raise BulkError(f"missing fields: {', '.join(missing)}")
+            letters.append((text_of(row), row))
+        except BulkError as e:
+            errors.append(f"row {n}: {e}")
+        except Exception as e:
+            errors.append(f"row {n}: text generation failed ({e})")
+    if errors:
+        more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+        raise BulkError("; ".join(errors[:5]) + more)
+    if not letters:
+        raise BulkError("the file has no rows")
+    return letters
+
+
+def merged_response(upload, text_of, export_batch, prefix="letter", validate=None, outline=True):
+    check_upload(upload)
+    letters = collect_letters(iter_rows(upload.filename, upload.stream), text_of, validate)
+    return send_export(
+        pooled(export_batch, letters, outline=outline), f"{prefix}_merged.pdf"
+    )
+
+
+def bulk_response(upload, render_row, fmt="pdf", prefix="letter", name_field="name", validate=None,
+                  text_of=None, export_batch=None):
+    # vérifié avant le streaming : l'appelant peut encore répondre par un flash
+    # text_of(ligne) + export_batch(lettres, output, outline) : format=merged
+    if fmt == MERGED and export_batch is not None:
+        outline = request.values.get("outline", "1").strip().lower() not in ("0", "false", "no", "off")
+        return merged_response(upload, text_of, export_batch, prefix, validate, outline)
+    if fmt not in EXTENSIONS:
+        raise BulkError("format must be pdf, docx or merged")
+    check_upload(upload)
+
+    # on détache le flux : Flask ferme request.files dès la fin de la vue,
+    # alors que les lignes sont lues pendant le streaming de la réponse
+    raw, upload.stream = upload.stream, io.BytesIO()
+    entries = render_entries(iter_rows(upload.filename, raw), render_row, fmt, prefix, name_field, validate)
+    return Response(
+        stream_with_context(stream_zip(entries)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{prefix}_bulk.zip"'},
+    )
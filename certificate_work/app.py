@@ -1,9 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import Flask, render_template, request, redirect, url_for, flash
+import io
 import os
-from werkzeug.utils import secure_filename
+
+import logos
+from bulk import bulk_response, BulkError
+import export_cache
+import export_jobs
+from downloads import pooled, send_export
 
 from .generator import generate_text
-from .utils import export_to_word, export_to_pdf, validate_required_fields
+from .utils import export_to_word, export_to_pdf, export_batch_pdf, validate_required_fields, make_filename, EXPORT_VERSION
 
 # ----- Flask App avec static_url_path pour DispatcherMiddleware -----
 app = Flask(
@@ -64,18 +70,14 @@ def generate():
     form = request.form.to_dict()
 
     file = request.files.get("company_logo_file")
+    form["company_logo"] = ""
     if file and allowed_file(file.filename) and file.filename.strip():
-        filename = secure_filename(file.filename)
-        upload_folder = os.path.join(app.root_path, "static", "uploads")
-        os.makedirs(upload_folder, exist_ok=True)
-
-        save_path = os.path.join(upload_folder, filename)
-        file.save(save_path)
-
-        # 🔴 CHEMIN DISQUE RELATIF POUR ReportLab
-        form["company_logo"] = os.path.join("static", "uploads", filename).replace("\\", "/")
-    else:
-        form["company_logo"] = ""
+        try:
+            # store partagé (data/logos, clé SHA-256) ; logo normalisé 3 cm @ 300 dpi
+            # 🔴 NOM DANS LE STORE, RÉSOLU PAR logos.resolve À L'EXPORT
+            form["company_logo"] = logos.store(file)["filename"]
+        except logos.LogoError as e:
+            flash(f"Logo ignored: {e}", "warning")
 
     missing = validate_required_fields(form, required=["company_name", "employee_name"])
     if missing:
@@ -84,6 +86,9 @@ def generate():
 
     result = generate_text(form)
     generated_text = result["full_text"]
+    # graine + indices renvoyés avec le texte : preview / export reproduisent la même lettre
+    form["seed"] = str(result["seed"])
+    form["variant_indices"] = result["variant_indices"]
 
     return render_template("index.html", generated_text=generated_text, **form)
 
@@ -108,8 +113,11 @@ def export_word_route():
     if not text:
         flash("No generated text to export.", "danger")
         return redirect(url_for("index"))
-    filename = export_to_word(text, form)
-    return send_file(filename, as_attachment=True)
+    return send_export(
+        lambda out: export_to_word(text, form, output=out),
+        make_filename(prefix="certificate", ext="docx"),
+        cache_key=export_cache.key("certificate.docx", EXPORT_VERSION, text, form),
+    )
 
 
 # ==============================
@@ -122,8 +130,48 @@ def export_pdf_route():
     if not text:
         flash("No generated text to export.", "danger")
         return redirect(url_for("index"))
-    filename = export_to_pdf(text, form)
-    return send_file(filename, as_attachment=True)
+    return send_export(
+        pooled(export_to_pdf, text, form),
+        make_filename(prefix="certificate", ext="pdf"),
+        cache_key=export_cache.key("certificate.pdf", EXPORT_VERSION, text, form),
+    )
+
+
+# ==============================
+#     EXPORT JOBS (ASYNC)
+# ==============================
+app.register_blueprint(export_jobs.blueprint({
+    "pdf": (export_to_pdf, "certificate.pdf", EXPORT_VERSION,
+            lambda form: make_filename(prefix="certificate", ext="pdf")),
+    "word": (export_to_word, "certificate.docx", EXPORT_VERSION,
+             lambda form: make_filename(prefix="certificate", ext="docx")),
+}))
+
+
+# ==============================
+#     BULK (CSV / JSONL -> ZIP)
+# ==============================
+@app.route("/bulk", methods=["POST"])
+def bulk_route():
+    def text_of(row):
+        return generate_text(row)["full_text"]
+
+    def render_row(row, fmt):
+        text = text_of(row)
+        buf = io.BytesIO()
+        (export_to_pdf if fmt == "pdf" else export_to_word)(text, row, output=buf)
+        return buf.getvalue()
+
+    try:
+        return bulk_response(
+            request.files.get("rows_file"), render_row, request.form.get("format", "pdf"),
+            prefix="certificate", name_field="employee_name",
+            validate=lambda row: validate_required_fields(row, required=["company_name", "employee_name"]),
+            text_of=text_of, export_batch=export_batch_pdf,
+        )
+    except BulkError as e:
+        flash(f"Bulk export: {e}", "danger")
+        return redirect(url_for("index"))
 
 
 # ==============================
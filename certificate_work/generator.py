@@ -1,38 +1,24 @@
-import random
 import os
-from datetime import datetime
+
+from dates import DATE_FIELDS, normalize_dates
+from variants import registry, compile_variants, fields_of, select_variants, format_indices, KEEP
 
 BASE_DIR = os.path.dirname(__file__)
 # Chemin corrigé pour ta structure : lettres/work_certificate/english
 LETTERS_DIR = os.path.join(BASE_DIR, "lettres", "work_certificate", "english")
 
+# corpus chargé une fois par worker (tuples immuables, rechargé si mtime change)
+registry.preload(LETTERS_DIR)
+
 def load_variants(filename):
-    path = os.path.join(LETTERS_DIR, filename)
-    if not os.path.exists(path):
-        return []
-    with open(path, encoding="utf-8") as f:
-        text = f.read()
-    parts = [p.strip() for p in text.split("\n---\n") if p.strip()]
-    return parts
-
-class SafeDict(dict):
-    def __missing__(self, key):
-        return "{" + key + "}"
-
-def pretty_date(s):
-    if not s:
-        return ""
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
-        try:
-            return datetime.strptime(s, fmt).strftime("%B %d, %Y")
-        except:
-            continue
-    return s
-
-def pick_random(variant_list):
-    if not variant_list:
-        return ""
-    return random.choice(variant_list)
+    return registry.compiled(LETTERS_DIR, filename)
+
+# champs absents : on garde "{champ}" dans le texte
+MISSING = KEEP
+
+FALLBACK_INTROS = compile_variants(["This is to certify that {employee_name} worked as {position} at {company_name}."])
+FALLBACK_BODIES = compile_variants(["Between {start_date} and {end_date}, {employee_name} demonstrated professionalism and fulfilled duties as described: {work_summary}"])
+FALLBACK_CONCLUSIONS = compile_variants(["We wish {employee_name} every success in their future endeavors."])
 
 def generate_text(user_info):
     # load variants
@@ -42,16 +28,17 @@ def generate_text(user_info):
 
     # fallback variants
     if not intros:
-        intros = ["This is to certify that {employee_name} worked as {position} at {company_name}."]
+        intros = FALLBACK_INTROS
     if not bodies:
-        bodies = ["Between {start_date} and {end_date}, {employee_name} demonstrated professionalism and fulfilled duties as described: {work_summary}"]
+        bodies = FALLBACK_BODIES
     if not conclusions:
-        conclusions = ["We wish {employee_name} every success in their future endeavors."]
+        conclusions = FALLBACK_CONCLUSIONS
 
-    # pick random parts
-    intro = pick_random(intros)
-    body = pick_random(bodies)
-    conclusion = pick_random(conclusions)
+    # seeded choice (same form -> same letter, see variants.select_variants)
+    chosen, indices, seed = select_variants(
+        [("intro", intros), ("body", bodies), ("conclusion", conclusions)], user_info
+    )
+    intro, body, conclusion = chosen["intro"], chosen["body"], chosen["conclusion"]
 
     info = user_info.copy()
     # keep compatibility with both employer_name and company_name
@@ -60,18 +47,14 @@ def generate_text(user_info):
     if not info.get("employer_name") and info.get("company_name"):
         info["employer_name"] = info.get("company_name")
 
-    # format dates
-    if info.get("start_date"):
-        info["start_date"] = pretty_date(info["start_date"])
-    if info.get("end_date"):
-        info["end_date"] = pretty_date(info["end_date"])
-    if info.get("signature_date"):
-        info["signature_date"] = pretty_date(info["signature_date"])
+    # format dates (only those the chosen variants actually use)
+    needed = fields_of(intro, body, conclusion)
+    normalize_dates(info, [key for key in DATE_FIELDS if key in needed])
 
-    # safe formatting
-    final_intro = intro.format_map(SafeDict(info))
-    final_body = body.format_map(SafeDict(info))
-    final_conclusion = conclusion.format_map(SafeDict(info))
+    # precompiled formatting
+    final_intro = intro.render(info, MISSING)
+    final_body = body.render(info, MISSING)
+    final_conclusion = conclusion.render(info, MISSING)
 
     # build professional assembly with optional sections
     parts = []
@@ -114,5 +97,7 @@ def generate_text(user_info):
         "intro": final_intro,
         "body": final_body,
         "conclusion": final_conclusion,
-        "full_text": full_text
+        "full_text": full_text,
+        "seed": seed,
+        "variant_indices": format_indices(indices)
     }
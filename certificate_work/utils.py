@@ -1,16 +1,14 @@
 import os
 import datetime
 
-from docx import Document
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Image,
-    HRFlowable, Table, TableStyle
-)
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
-from reportlab.lib.units import cm
-from reportlab.lib.colors import black, HexColor, Color
+import decorations
+import fastpdf
+import logos
+
+# version de la mise en page : à incrémenter quand l'export change (clé du cache d'export)
+EXPORT_VERSION = 4
+
+# ReportLab / python-docx sont importés au premier export (voir export_*)
 
 
 # ==============================
@@ -29,6 +27,15 @@ os.makedirs(EXPORT_PDF_DIR, exist_ok=True)
 # ==============================
 #        UTILITAIRES
 # ==============================
+# ==============================
+#        WATERMARK
+# ==============================
+# form XObject : dessiné une fois par document, référencé sur chaque page
+WATERMARK = decorations.watermark(
+    "LETTRIX - WEB", 70, (0.6, 0.6, 0.6, 0.12), origin=(300, 400)
+)
+
+
 def make_filename(prefix="certificate", ext="pdf"):
     ts = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     return f"{prefix}_{ts}.{ext}"
@@ -37,7 +44,9 @@ def make_filename(prefix="certificate", ext="pdf"):
 # ==============================
 #        EXPORT WORD
 # ==============================
-def export_to_word(text, metadata=None):
+def export_to_word(text, metadata=None, output=None):
+    from docx import Document
+
     doc = Document()
     doc.add_heading("WORK CERTIFICATE", level=1)
 
@@ -49,43 +58,20 @@ def export_to_word(text, metadata=None):
 
     filename = make_filename(prefix="certificate", ext="docx")
     path = os.path.join(EXPORT_WORD_DIR, filename)
-    doc.save(path)
-    return path
+    doc.save(output or path)
+    return output or path
 
 
 # ==============================
 #        EXPORT PDF
 # ==============================
-def export_to_pdf(text, metadata=None):
-    metadata = metadata or {}
+def _pdf_doc(target):
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
 
-    # --------- METADATA ----------
-    company_name = metadata.get("company_name", "")
-    company_address = metadata.get("company_address", "")
-    company_phone = metadata.get("company_phone", "")
-    company_email = metadata.get("company_email", "")
-    employee_name = metadata.get("employee_name", "")
-    position = metadata.get("position", "")
-    department = metadata.get("department", "")
-    start_date = metadata.get("start_date", "")
-    end_date = metadata.get("end_date", "")
-    contract_type = metadata.get("contract_type", "")
-    signer_name = metadata.get("signer_name", "")
-    signer_role = metadata.get("signer_role", "")
-    signature_place = metadata.get("signature_place", "")
-    signature_date = metadata.get("signature_date", "")
-
-    # 🔴 LOGO = CHEMIN FICHIER RÉEL (UPLOAD UTILISATEUR)
-    logo_path = metadata.get("company_logo", "").strip()
-    if logo_path and not os.path.isabs(logo_path):
-        logo_path = os.path.normpath(os.path.join(PROJECT_ROOT, logo_path))
-
-    # --------- PDF FILE ----------
-    filename = make_filename(prefix="certificate", ext="pdf")
-    path = os.path.join(EXPORT_PDF_DIR, filename)
-
-    doc = SimpleDocTemplate(
-        path,
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         leftMargin=1.5 * cm,
         rightMargin=1.5 * cm,
@@ -93,9 +79,13 @@ def export_to_pdf(text, metadata=None):
         bottomMargin=1.2 * cm,
     )
 
-    story = []
 
-    # --------- STYLES ----------
+def _pdf_styles():
+    # une fois par document (partagés par toutes les lettres d'un lot)
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_JUSTIFY
+    from reportlab.lib.colors import HexColor
+
     title_style = ParagraphStyle(
         "Title",
         fontSize=16,
@@ -132,23 +122,63 @@ def export_to_pdf(text, metadata=None):
         alignment=TA_CENTER,
         textColor=HexColor("#666666"),
     )
+    return title_style, subtitle_style, normal, right_style, small_center
+
+
+def _pdf_story(text, metadata, styles, cache=None):
+    # cache : flowables partagés entre les lettres d'un lot (voir fastpdf.shared)
+    from reportlab.platypus import (
+        Paragraph, Spacer, Image,
+        HRFlowable, Table, TableStyle
+    )
+    from reportlab.lib.units import cm
+    from reportlab.lib.colors import black
+
+    metadata = metadata or {}
+    title_style, subtitle_style, normal, right_style, small_center = styles
+
+    # --------- METADATA ----------
+    company_name = metadata.get("company_name", "")
+    company_address = metadata.get("company_address", "")
+    company_phone = metadata.get("company_phone", "")
+    company_email = metadata.get("company_email", "")
+    employee_name = metadata.get("employee_name", "")
+    position = metadata.get("position", "")
+    department = metadata.get("department", "")
+    start_date = metadata.get("start_date", "")
+    end_date = metadata.get("end_date", "")
+    contract_type = metadata.get("contract_type", "")
+    signer_name = metadata.get("signer_name", "")
+    signer_role = metadata.get("signer_role", "")
+    signature_place = metadata.get("signature_place", "")
+    signature_date = metadata.get("signature_date", "")
+
+    # 🔴 LOGO = CHEMIN FICHIER RÉEL (UPLOAD UTILISATEUR)
+    # nom dans le store ou chemin relatif au projet (contrôlé par logos)
+    logo_path = logos.resolve(metadata.get("company_logo"), PROJECT_ROOT)
+    compact = fastpdf.compact(metadata)
+
+    story = []
 
     # ==============================
     #        HEADER (LOGO UPLOAD)
     # ==============================
+    def logo():
+        img = Image(logos.for_pdf(logo_path, compact))
+        img.drawHeight = 3 * cm
+        img.drawWidth = 3 * cm
+        img.hAlign = "RIGHT"
+        return img
+
     if logo_path and os.path.isfile(logo_path):
         try:
-            img = Image(logo_path)
-            img.drawHeight = 3 * cm
-            img.drawWidth = 3 * cm
-            img.hAlign = "RIGHT"
-            story.append(img)
+            story.append(fastpdf.shared(cache, ("logo", logo_path, compact), logo))
             story.append(Spacer(1, 6))
         except Exception as e:
             print("LOGO ERROR:", e)
 
     if company_name:
-        story.append(Paragraph(company_name, title_style))
+        story.append(fastpdf.P(company_name, title_style))
 
     header_lines = []
     if company_address:
@@ -164,7 +194,7 @@ def export_to_pdf(text, metadata=None):
         header_lines.append(" | ".join(contacts))
 
     if header_lines:
-        story.append(Paragraph("<br/>".join(header_lines), subtitle_style))
+        story.append(fastpdf.P("<br/>".join(header_lines), subtitle_style))
 
     story.append(Spacer(1, 6))
     story.append(HRFlowable(width="100%", thickness=1, color=black))
@@ -173,29 +203,35 @@ def export_to_pdf(text, metadata=None):
     # ==============================
     #        TITLE
     # ==============================
-    story.append(Paragraph("WORK CERTIFICATE", title_style))
+    story.append(fastpdf.P("WORK CERTIFICATE", title_style))
     story.append(Spacer(1, 12))
 
     # ==============================
     #        EMPLOYEE TABLE
     # ==============================
+    def label(name):
+        return fastpdf.shared(
+            cache, ("label", name),
+            lambda: Paragraph(f'<font color="#f1c40f">{name}:</font>', normal),
+        )
+
     rows = []
     if employee_name:
         rows.append([
-            Paragraph('<font color="#f1c40f">Employee:</font>', normal),
+            label("Employee"),
             employee_name
         ])
 
     if position:
-        rows.append([Paragraph('<font color="#f1c40f">Position:</font>', normal), position])
+        rows.append([label("Position"), position])
     if department:
-        rows.append([Paragraph('<font color="#f1c40f">Department:</font>', normal), department])
+        rows.append([label("Department"), department])
     if contract_type:
-        rows.append([Paragraph('<font color="#f1c40f">Contract type:</font>', normal), contract_type])
+        rows.append([label("Contract type"), contract_type])
     if start_date:
-        rows.append([Paragraph('<font color="#f1c40f">Start date:</font>', normal), start_date])
+        rows.append([label("Start date"), start_date])
     if end_date:
-        rows.append([Paragraph('<font color="#f1c40f">End date:</font>', normal), end_date])
+        rows.append([label("End date"), end_date])
 
     if rows:
         table = Table(rows, colWidths=[90, 350])
@@ -210,12 +246,12 @@ def export_to_pdf(text, metadata=None):
     # ==============================
     #        TEXT
     # ==============================
-    story.append(Paragraph("To whom it may concern,", normal))
+    story.append(fastpdf.P("To whom it may concern,", normal))
     story.append(Spacer(1, 6))
 
     for paragraph in text.split("\n\n"):
         if paragraph.strip():
-            story.append(Paragraph(paragraph.replace("\n", "<br/>"), normal))
+            story.append(fastpdf.P(paragraph.replace("\n", "<br/>"), normal))
             story.append(Spacer(1, 6))
 
     story.append(Spacer(1, 18))
@@ -224,40 +260,54 @@ def export_to_pdf(text, metadata=None):
     #        SIGNATURE
     # ==============================
     if signer_name:
-        story.append(Paragraph(signer_name, right_style))
+        story.append(fastpdf.P(signer_name, right_style))
     if signer_role:
-        story.append(Paragraph(signer_role, right_style))
+        story.append(fastpdf.P(signer_role, right_style))
     if signature_place or signature_date:
         story.append(
-            Paragraph(f"{signature_place} {signature_date}".strip(), right_style)
+            fastpdf.P(f"{signature_place} {signature_date}".strip(), right_style)
         )
 
     story.append(Spacer(1, 20))
     story.append(
-        Paragraph('<font color="#f1c40f">Signature: ____________________</font>', normal)
+        fastpdf.P('<font color="#f1c40f">Signature: ____________________</font>', normal)
     )
 
     story.append(Spacer(1, 20))
-    story.append(Paragraph(
+    story.append(fastpdf.P(
         "This certificate is issued upon the request of the concerned employee.",
         small_center
     ))
 
-    # ==============================
-    #        WATERMARK
-    # ==============================
-    def add_watermark(canvas, doc):
-        canvas.saveState()
-        canvas.setFont("Helvetica-Bold", 70)
-        canvas.setFillColor(Color(0.6, 0.6, 0.6, alpha=0.12))
-        canvas.translate(300, 400)
-        canvas.rotate(45)
-        canvas.drawCentredString(0, 0, "LETTRIX - WEB")
-        canvas.restoreState()
-
-    doc.build(story, onFirstPage=add_watermark, onLaterPages=add_watermark)
-
-    return path
+    return story, WATERMARK
+
+
+def export_to_pdf(text, metadata=None, output=None):
+    filename = make_filename(prefix="certificate", ext="pdf")
+    path = os.path.join(EXPORT_PDF_DIR, filename)
+
+    doc = _pdf_doc(output or path)
+    story, on_page = _pdf_story(text, metadata, _pdf_styles())
+    fastpdf.build(doc, story, onFirstPage=on_page, onLaterPages=on_page)
+
+    return output or path
+
+
+def export_batch_pdf(letters, output=None, outline=True):
+    # letters : [(texte, metadata)] -> un seul PDF, une lettre par page,
+    # un signet par salarié (outline=False : sans signets)
+    filename = make_filename(prefix="certificate_batch", ext="pdf")
+    path = os.path.join(EXPORT_PDF_DIR, filename)
+
+    doc = _pdf_doc(output or path)
+    styles, cache = _pdf_styles(), {}
+    batch = []
+    for text, metadata in letters:
+        story, on_page = _pdf_story(text, metadata, styles, cache)
+        batch.append(((metadata or {}).get("employee_name", ""), story, on_page))
+    fastpdf.build_batch(doc, batch, outline=outline)
+
+    return output or path
 
 
 # ==============================
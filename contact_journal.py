@@ -0,0 +1,219 @@
+import glob
+import json
+import os
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev local) : pas de verrou inter-process
+    fcntl = None
+
+# ================= CONTACT MESSAGES JOURNAL =================
+# Journal JSONL en ajout seul : chaque message = une ligne écrite d'un seul
+# os.write() sur un descripteur O_APPEND, donc pas de réécriture du fichier
+# et pas de message perdu entre workers concurrents.
+#
+#   data/messages.jsonl                  segment actif
+#   data/messages.<YYYYmmddHHMMSS>.jsonl segments tournés (plus anciens)
+#   data/messages.json                   ancien fichier, lu tant qu'il n'est
+#                                        pas migré (python contact_journal.py migrate)
+
+DATA_DIR = "data"
+LEGACY_FILE = os.path.join(DATA_DIR, "messages.json")
+JOURNAL_FILE = os.path.join(DATA_DIR, "messages.jsonl")
+LOCK_FILE = os.path.join(DATA_DIR, "messages.lock")
+
+ROTATE_BYTES = 1024 * 1024      # rotation du segment actif au-delà de 1 Mo
+COMPACT_AFTER = 8               # fusion quand plus de N segments tournés
+COMPACT_INTERVAL = 600          # secondes entre deux passes du compacteur
+
+READ_BLOCK = 64 * 1024
+
+
+# ----- verrou inter-workers (migration / rotation / compaction) -----
+class _FileLock:
+    def __enter__(self):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        self.fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+def _segment_name(stamp):
+    return os.path.join(DATA_DIR, f"messages.{stamp}.jsonl")
+
+
+def _encode(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _append_bytes(path, data):
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def rotated_segments():
+    # du plus ancien au plus récent (le nom contient l'horodatage)
+    return sorted(glob.glob(_segment_name("[0-9]*")))
+
+
+# ================= WRITE =================
+def append(message):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    _append_bytes(JOURNAL_FILE, _encode(message))
+    try:
+        if os.path.getsize(JOURNAL_FILE) >= ROTATE_BYTES:
+            rotate()
+    except OSError:
+        pass
+
+
+def rotate():
+    with _FileLock():
+        if not os.path.exists(JOURNAL_FILE) or os.path.getsize(JOURNAL_FILE) < ROTATE_BYTES:
+            return None
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        target = _segment_name(stamp)
+        n = 1
+        while os.path.exists(target):
+            target = _segment_name(f"{stamp}{n:02d}")
+            n += 1
+        os.rename(JOURNAL_FILE, target)
+        return target
+
+
+# ================= MIGRATION (messages.json -> JSONL) =================
+# étape unique et explicite, jamais lancée à l'import :
+#   python contact_journal.py migrate
+def migrate():
+    with _FileLock():
+        if not os.path.exists(LEGACY_FILE):
+            return 0
+        try:
+            with open(LEGACY_FILE, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+        except ValueError:
+            messages = []
+        # segment "le plus ancien" pour garder l'ordre chronologique
+        target = _segment_name("0" * 14)
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            for message in messages:
+                f.write(_encode(message))
+        os.replace(tmp, target)
+        os.replace(LEGACY_FILE, LEGACY_FILE + ".migrated")
+        return len(messages)
+
+
+# ================= COMPACTION =================
+def compact():
+    # fusionne les segments tournés en un seul, en ignorant les lignes corrompues
+    with _FileLock():
+        segments = rotated_segments()
+        if len(segments) <= COMPACT_AFTER:
+            return 0
+        target = segments[0]
+        tmp = target + ".tmp"
+        kept = 0
+        with open(tmp, "wb") as out:
+            for path in segments:
+                with open(path, "rb") as f:
+                    for line in f:
+                        try:
+                            json.loads(line)
+                        except ValueError:
+                            continue
+                        out.write(line if line.endswith(b"\n") else line + b"\n")
+                        kept += 1
+        os.replace(tmp, target)
+        for path in segments[1:]:
+            os.remove(path)
+        return kept
+
+
+def start_compactor(interval=COMPACT_INTERVAL):
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                compact()
+            except Exception as e:
+                print("JOURNAL COMPACT ERROR:", e)
+
+    threading.Thread(target=run, name="messages-compactor", daemon=True).start()
+    return stop
+
+
+# ================= READ (paginé, du plus récent au plus ancien) =================
+def _reverse_lines(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            size = min(READ_BLOCK, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size) + tail
+            lines = chunk.split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if tail.strip():
+            yield tail
+
+
+def _legacy_messages():
+    # data/messages.json non migré : liste JSON, du plus ancien au plus récent
+    try:
+        with open(LEGACY_FILE, "r", encoding="utf-8") as f:
+            return list(reversed(json.load(f)))
+    except (OSError, ValueError):
+        return []
+
+
+def iter_messages():
+    paths = [JOURNAL_FILE] + list(reversed(rotated_segments()))
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        for line in _reverse_lines(path):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+    yield from _legacy_messages()
+
+
+def read_page(offset=0, limit=20):
+    # ne lit que offset + limit lignes depuis la fin, jamais tout l'historique
+    items = []
+    has_more = False
+    for i, message in enumerate(iter_messages()):
+        if i < offset:
+            continue
+        if len(items) == limit:
+            has_more = True
+            break
+        items.append(message)
+    return items, (offset + limit if has_more else None)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("usage: python contact_journal.py migrate")
+    print("MESSAGES MIGRATED:", migrate())
@@ -0,0 +1,82 @@
+from datetime import date
+from functools import lru_cache
+
+# ================= DATE NORMALIZATION =================
+# Remplace les pretty_date copiés dans chaque générateur : parse sans
+# strptime (AAAA-MM-JJ, JJ/MM/AAAA, JJ-MM-AAAA, AAAA/MM/JJ), résultat
+# mémorisé (LRU) et noms de mois indépendants de la locale du serveur.
+# Chaque générateur appelle normalize_dates(info) une fois, avant de
+# composer le texte ; la langue de sortie vient du champ "locale" du
+# formulaire (ou de la colonne du fichier bulk), sinon DEFAULT_LOCALE.
+
+DATE_FIELDS = (
+    "start_date", "end_date", "signature_date",
+    "letter_date", "last_working_day", "submission_date",
+)
+
+DEFAULT_LOCALE = "en"
+
+# nom -> (mois, pattern str.format avec {day}, {day2} (zéro initial), {month}, {year})
+# une nouvelle langue = une nouvelle entrée (le cache est indexé par nom)
+LOCALES = {
+    "en": ((
+        "January", "February", "March", "April", "May", "June", "July",
+        "August", "September", "October", "November", "December",
+    ), "{month} {day2}, {year}"),
+    "fr": ((
+        "janvier", "février", "mars", "avril", "mai", "juin", "juillet",
+        "août", "septembre", "octobre", "novembre", "décembre",
+    ), "{day} {month} {year}"),
+}
+
+
+def parse_date(s):
+    s = s.strip()
+    sep = "-" if "-" in s else "/"
+    parts = s.split(sep)
+    if len(parts) != 3 or not all(p.isdigit() and p.isascii() for p in parts):
+        return None
+    if len(parts[0]) == 4:
+        year, month, day = parts
+    elif len(parts[2]) == 4:
+        day, month, year = parts
+    else:
+        return None
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def format_date(d, locale=DEFAULT_LOCALE):
+    months, pattern = LOCALES[locale]
+    return pattern.format(
+        day=d.day, day2=f"{d.day:02d}", month=months[d.month - 1], year=d.year
+    )
+
+
+@lru_cache(maxsize=2048)
+def _pretty(s, locale):
+    d = parse_date(s)
+    return format_date(d, locale) if d else s
+
+
+def pretty_date(s, locale=DEFAULT_LOCALE):
+    # valeur vide -> "", valeur non reconnue -> renvoyée telle quelle
+    if not s:
+        return ""
+    return _pretty(s, locale)
+
+
+def locale_of(info):
+    name = str(info.get("locale") or "").strip().lower()
+    return name if name in LOCALES else DEFAULT_LOCALE
+
+
+def normalize_dates(info, fields=DATE_FIELDS, locale=None):
+    # info : copie du formulaire, modifiée sur place
+    locale = locale or locale_of(info)
+    for key in fields:
+        if info.get(key):
+            info[key] = pretty_date(info[key], locale)
+    return info
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import threading
+
+from flask import g, has_app_context
+
+# ================= SQLITE CONNECTION MANAGER =================
+# Une connexion par thread (et par process gunicorn), réutilisée d'une
+# requête à l'autre : WAL + synchronous=NORMAL pour que les lecteurs ne
+# bloquent plus les écrivains, busy timeout au lieu de "database is locked",
+# et cache de requêtes préparées conservé tant que la connexion vit.
+
+DB_NAME = "database.db"
+BUSY_TIMEOUT = 5.0          # secondes
+CACHED_STATEMENTS = 256     # requêtes préparées gardées par connexion
+
+STATS = {"opened": 0, "reused": 0}
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        STATS[key] += 1
+
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+    return conn
+
+
+def connect(path=DB_NAME):
+    # connexion du thread courant ; rouverte après un fork (gunicorn --preload)
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.pid != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is not None:
+        _count("reused")
+        return conn
+    conn = conns[path] = _open(path)
+    _count("opened")
+    return conn
+
+
+def get_db():
+    if not has_app_context():
+        return connect()
+    if "db" not in g:
+        g.db = connect()
+    return g.db
+
+
+def release_db(exc=None):
+    # fin du contexte : on ne ferme pas, on rend la connexion propre au thread
+    conn = g.pop("db", None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def close_all():
+    conns = getattr(_local, "conns", None) or {}
+    for conn in conns.values():
+        conn.close()
+    conns.clear()
+
+
+def stats():
+    with _stats_lock:
+        data = dict(STATS)
+    total = data["opened"] + data["reused"]
+    data["reuse_ratio"] = round(data["reused"] / total, 3) if total else 0.0
+    return data
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db)
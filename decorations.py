@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# ================= PDF PAGE DECORATIONS (FORM XOBJECTS) =================
+# Filigrane et en-tête sont dessinés une seule fois par document dans un
+# form XObject ReportLab (beginForm/endForm), puis chaque page ne fait
+# qu'un "/Form Do". Les définitions sont mises en cache dans le process :
+# le filigrane (statique) est partagé par tous les documents, l'en-tête
+# d'entreprise est mis en cache par hash de son contenu (LRU).
+
+LETTERHEAD_CACHE_SIZE = 64
+
+_watermarks = {}
+_letterheads = OrderedDict()
+_lock = threading.Lock()
+
+
+def _fill(canvas, color):
+    from reportlab.lib.colors import Color, HexColor
+
+    if isinstance(color, str):
+        canvas.setFillColor(HexColor(color))
+    else:
+        r, g, b, alpha = color
+        canvas.setFillColor(Color(r, g, b, alpha=alpha))
+
+
+class Decoration:
+    def __init__(self, name, draw):
+        self.name = name
+        self.draw = draw
+
+    def ensure(self, canvas):
+        # une définition par document (par canvas), réutilisée sur chaque page
+        if not canvas.hasForm(self.name):
+            canvas.beginForm(self.name)
+            self.draw(canvas)
+            canvas.endForm()
+
+    def __call__(self, canvas, doc=None):
+        self.ensure(canvas)
+        canvas.saveState()
+        canvas.doForm(self.name)
+        canvas.restoreState()
+
+
+def combine(*decorations):
+    decorations = [d for d in decorations if d is not None]
+
+    def on_page(canvas, doc):
+        for decoration in decorations:
+            decoration(canvas, doc)
+
+    return on_page
+
+
+# ================= WATERMARK =================
+def watermark(text, font_size, color, origin=None, angle=45, font="Helvetica-Bold",
+              pagesize=None):
+    # color : (r, g, b, alpha) ou "#RRGGBB" ; origin None = centre de la page
+    # (pagesize, A4 par défaut comme tous les exporteurs)
+    key = (text, font_size, color, origin, angle, font, pagesize)
+    with _lock:
+        decoration = _watermarks.get(key)
+        if decoration is None:
+            name = "wm_" + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+
+            def draw(canvas):
+                from reportlab.lib.pagesizes import A4
+
+                width, height = pagesize or A4
+                x, y = origin or (width / 2, height / 2)
+                canvas.saveState()
+                canvas.setFont(font, font_size)
+                _fill(canvas, color)
+                canvas.translate(x, y)
+                canvas.rotate(angle)
+                canvas.drawCentredString(0, 0, text)
+                canvas.restoreState()
+
+            decoration = _watermarks[key] = Decoration(name, draw)
+        return decoration
+
+
+# ================= LETTERHEAD =================
+def file_signature(path):
+    # identité du fichier logo sans le relire : chemin + taille + mtime
+    if not path or not os.path.isfile(path):
+        return None
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def letterhead(content, draw):
+    # content : tout ce qui change le rendu (textes, signature du logo...)
+    # draw(canvas, cache) : cache = dict propre à l'en-tête (ex. ImageReader du logo)
+    digest = hashlib.sha1(repr(content).encode("utf-8")).hexdigest()[:16]
+    with _lock:
+        decoration = _letterheads.get(digest)
+        if decoration is not None:
+            _letterheads.move_to_end(digest)
+            return decoration
+        cache = {}
+        decoration = Decoration("lh_" + digest, lambda canvas: draw(canvas, cache))
+        _letterheads[digest] = decoration
+        while len(_letterheads) > LETTERHEAD_CACHE_SIZE:
+            _letterheads.popitem(last=False)
+        return decoration
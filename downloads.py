@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from flask import request, send_file
+
+import export_cache
+import fastpdf
+import render_pool
+
+# ================= IN-MEMORY EXPORTS =================
+# Les routes d'export rendent le PDF / DOCX dans un tampon mémoire envoyé
+# directement par send_file : plus d'écriture dans export/, plus de nom de
+# fichier partagé entre requêtes concurrentes. Au-delà de SPILL_BYTES le
+# tampon bascule sur un fichier temporaire anonyme (supprimé à la fermeture).
+
+SPILL_BYTES = int(os.environ.get("LETTRIX_EXPORT_SPILL_BYTES", 8 * 1024 * 1024))
+
+MIMETYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+# PDF compact (compact=1) : tailles normal -> compact, voir _report_sizes
+STATS = {"documents": 0, "bytes_in": 0, "bytes_out": 0}
+
+_stats_lock = threading.Lock()
+# rendus "normal" en cours hors requête (clés dérivées), voir _report_sizes
+_pending = set()
+MAX_PENDING = 4
+
+
+def stats():
+    with _stats_lock:
+        out = dict(STATS)
+    out["saved_ratio"] = round(1 - out["bytes_out"] / out["bytes_in"], 3) if out["bytes_in"] else 0.0
+    return out
+
+
+def render_to_buffer(render, spill=SPILL_BYTES):
+    # render(output) écrit le document dans output (fichier binaire)
+    buf = tempfile.SpooledTemporaryFile(max_size=spill)
+    try:
+        render(buf)
+    except Exception:
+        buf.close()
+        raise
+    size = buf.seek(0, os.SEEK_END)
+    buf.seek(0)
+    return buf, size
+
+
+def pooled(func, *args, **kwargs):
+    # rendu dans les process de render_pool si activé (LETTRIX_RENDER_WORKERS)
+    def render(out):
+        if not render_pool.enabled():
+            return func(*args, output=out, **kwargs)
+        out.write(render_pool.render(func, *args, **kwargs))
+
+    # exporteur (texte, métadonnées) : même document, métadonnées modifiées
+    if len(args) >= 2 and isinstance(args[1], dict):
+        render.variant = lambda **changes: pooled(
+            func, args[0], dict(args[1], **changes), *args[2:], **kwargs
+        )
+    return render
+
+
+def _send(file, download_name, size):
+    ext = download_name.rsplit(".", 1)[-1].lower()
+    # le tampon est fermé par werkzeug à la fin de la réponse
+    response = send_file(
+        file,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=MIMETYPES.get(ext, "application/octet-stream"),
+    )
+    response.content_length = size
+    return response
+
+
+def _original_key(cache_key):
+    return hashlib.sha256(f"{cache_key}:normal".encode()).hexdigest()
+
+
+def _render_original(render, key):
+    # hors requête : rend le PDF normal une fois et le garde en cache
+    try:
+        buf, _ = render_to_buffer(render.variant(compact="0"))
+        with buf:
+            export_cache.cache.put(key, buf.read())
+    except Exception as e:
+        print("PDF ORIGINAL SIZE ERROR:", e)
+    finally:
+        with _stats_lock:
+            _pending.discard(key)
+
+
+def _report_sizes(response, render, cache_key):
+    # X-Export-Size : taille envoyée, plus celle du même PDF en mode normal
+    # si elle est déjà en cache. Sinon le PDF normal est rendu par un thread
+    # à part (jamais dans la requête) et les exports suivants l'afficheront
+    size = response.content_length
+    key = _original_key(cache_key) if cache_key else None
+    original = export_cache.cache.get(key) if key else None
+    if original is None:
+        response.headers["X-Export-Size"] = f"compact={size}"
+        with _stats_lock:
+            start = key is not None and key not in _pending and len(_pending) < MAX_PENDING
+            if start:
+                _pending.add(key)
+        if start:
+            threading.Thread(target=_render_original, args=(render, key),
+                             name="pdf-original-size", daemon=True).start()
+        return response
+    response.headers["X-Export-Size"] = f"original={len(original)}; compact={size}"
+    with _stats_lock:
+        STATS["documents"] += 1
+        STATS["bytes_in"] += len(original)
+        STATS["bytes_out"] += size
+    return response
+
+
+def send_export(render, download_name, spill=SPILL_BYTES, cache_key=None):
+    # cache_key (export_cache.key(...)) : rendu servi depuis le cache. Pas
+    # d'ETag / 304 : un formulaire POST n'envoie jamais If-None-Match (le
+    # téléchargement GET des exports asynchrones, lui, passe par send_file)
+    # compact=1 (formulaire ou URL) sur un PDF : rendu par l'exporteur lui-même
+    # (logos réduits, voir fastpdf.compact) ; la réponse donne les deux tailles
+    response = _send_export(render, download_name, spill, cache_key)
+    if (download_name.lower().endswith(".pdf")
+            and hasattr(render, "variant") and fastpdf.compact(request.values)):
+        _report_sizes(response, render, cache_key)
+    return response
+
+
+def _send_export(render, download_name, spill, cache_key):
+    if cache_key is None:
+        buf, size = render_to_buffer(render, spill)
+        return _send(buf, download_name, size)
+
+    data = export_cache.cache.get(cache_key)
+    if data is None:
+        buf, size = render_to_buffer(render, spill)
+        if size > export_cache.MAX_ENTRY_BYTES:
+            export_cache.count("skipped")
+            return _send(buf, download_name, size)
+        with buf:
+            data = buf.read()
+        export_cache.cache.put(cache_key, data)
+    return _send(io.BytesIO(data), download_name, len(data))
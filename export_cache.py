@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import fastpdf
+import logos
+
+# ================= EXPORT CACHE =================
+# Un export identique (même type de lettre, même version d'exporteur, même
+# texte, mêmes métadonnées, même logo) n'est rendu qu'une fois : les octets
+# sont gardés dans un LRU mémoire borné en taille et en âge, doublé d'un
+# tier disque (data/export_cache) partagé entre workers.
+
+MEMORY_BYTES = int(os.environ.get("LETTRIX_EXPORT_CACHE_MEMORY", 32 * 1024 * 1024))
+DISK_BYTES = int(os.environ.get("LETTRIX_EXPORT_CACHE_DISK", 256 * 1024 * 1024))
+MAX_ENTRY_BYTES = 4 * 1024 * 1024   # au-delà : rendu servi sans mise en cache
+MEMORY_MAX_AGE = 3600               # secondes
+DISK_MAX_AGE = 24 * 3600
+SWEEP_INTERVAL = 60                 # au plus un balayage disque par minute
+CACHE_DIR = os.path.join("data", "export_cache")
+
+# champs du formulaire sans effet sur le document (le texte est haché à part)
+IGNORED_FIELDS = frozenset(("generated_text", "seed", "variant_indices", "compact"))
+# sauf "compact", remplacé par sa valeur effective (voir fastpdf.compact)
+LOGO_FIELDS = ("company_logo", "company_logo_path")
+
+STATS = {
+    "memory_hits": 0, "disk_hits": 0, "misses": 0,
+    "stored": 0, "skipped": 0, "evicted": 0,
+}
+
+_stats_lock = threading.Lock()
+
+
+def count(key, n=1):
+    with _stats_lock:
+        STATS[key] += n
+
+
+def stats():
+    with _stats_lock:
+        out = dict(STATS)
+    hits = out["memory_hits"] + out["disk_hits"]
+    total = hits + out["misses"]
+    out["hit_ratio"] = round(hits / total, 3) if total else 0.0
+    out["memory_bytes"], out["memory_entries"] = cache.memory_usage()
+    return out
+
+
+def key(kind, version, text, metadata):
+    # kind : "certificate.pdf", "leave.docx"... ; version : EXPORT_VERSION de l'exporteur
+    meta = {k: str(v) for k, v in (metadata or {}).items() if k not in IGNORED_FIELDS}
+    for field in LOGO_FIELDS:
+        if meta.get(field):
+            meta[field] = logos.fingerprint(meta[field])
+    if fastpdf.compact(metadata):
+        meta["compact"] = "1"
+    payload = json.dumps(
+        [kind, str(version), text or "", meta], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    def __init__(self, directory=CACHE_DIR, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()   # clé -> (stocké à, octets)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    # ----- mémoire -----
+    def _memory_get(self, k, now):
+        with self._lock:
+            entry = self._memory.get(k)
+            if entry is None:
+                return None
+            if now - entry[0] > MEMORY_MAX_AGE:
+                self._drop(k)
+                return None
+            self._memory.move_to_end(k)
+            return entry[1]
+
+    def _drop(self, k):
+        _, data = self._memory.pop(k)
+        self._size -= len(data)
+
+    def _memory_put(self, k, data, now):
+        with self._lock:
+            if k in self._memory:
+                self._drop(k)
+            self._memory[k] = (now, data)
+            self._size += len(data)
+            evicted = 0
+            while self._size > self.memory_bytes and self._memory:
+                self._drop(next(iter(self._memory)))
+                evicted += 1
+        if evicted:
+            count("evicted", evicted)
+
+    def memory_usage(self):
+        with self._lock:
+            return self._size, len(self._memory)
+
+    # ----- disque -----
+    def _path(self, k):
+        return os.path.join(self.directory, k[:2], k)
+
+    def _disk_get(self, k, now):
+        path = self._path(k)
+        try:
+            if now - os.stat(path).st_mtime > DISK_MAX_AGE:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # LRU : l'âge repart du dernier usage
+        except OSError:
+            pass
+        return data
+
+    def _disk_put(self, k, data):
+        path = self._path(k)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def sweep(self, now=None):
+        # expirés d'abord, puis les plus anciens jusqu'à repasser sous DISK_BYTES
+        now = now or time.time()
+        entries, total = [], 0
+        if not os.path.isdir(self.directory):
+            return 0
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        entries.sort()
+        removed = 0
+        for mtime, size, path in entries:
+            expired = now - mtime > DISK_MAX_AGE
+            if not expired and total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            count("evicted", removed)
+        return removed
+
+    def _maybe_sweep(self, now):
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        try:
+            self.sweep(now)
+        except Exception as e:
+            print("EXPORT CACHE SWEEP ERROR:", e)
+
+    # ----- API -----
+    def get(self, k):
+        now = time.time()
+        data = self._memory_get(k, now)
+        if data is not None:
+            count("memory_hits")
+            return data
+        data = self._disk_get(k, now)
+        if data is not None:
+            count("disk_hits")
+            self._memory_put(k, data, now)
+            return data
+        count("misses")
+        return None
+
+    def put(self, k, data):
+        if len(data) > MAX_ENTRY_BYTES:
+            count("skipped")
+            return
+        now = time.time()
+        self._memory_put(k, data, now)
+        try:
+            self._disk_put(k, data)
+        except OSError as e:
+            print("EXPORT CACHE WRITE ERROR:", e)
+        count("stored")
+        self._maybe_sweep(now)
+
+
+cache = ExportCache()
@@ -0,0 +1,382 @@
+import io
+import json
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+
+from flask import Blueprint, jsonify, request, send_file, url_for
+from werkzeug.exceptions import ServiceUnavailable
+
+import db
+import export_cache
+import render_pool
+from downloads import MIMETYPES
+
+# ================= ASYNCHRONOUS EXPORT JOBS =================
+# POST .../jobs/export/<pdf|word> enregistre le job dans SQLite et répond
+# tout de suite (202 + id). Des process locaux vident la file : rendu (ou
+# cache d'export), fichier écrit dans data/export_jobs, statut "done".
+# Un job en échec est retenté (MAX_ATTEMPTS, délai croissant) ; un job
+# "running" dont le process a disparu est repris après LEASE secondes ;
+# les fichiers expirent après RESULT_TTL.
+#
+# Par défaut le worker HTTP lance son propre process de traitement au
+# premier submit() : jamais à l'import, un enfant spawn ré-importe le module
+# principal (app.py). LETTRIX_EXPORT_JOB_WORKERS=0 : la file est vidée par
+# "python export_jobs.py" lancé à part, sur la même machine (même
+# database.db, même data/export_jobs). Chaque process de traitement signale
+# sa présence dans export_job_workers ; sans aucun process vivant, submit()
+# refuse le job (503) au lieu de le laisser en file pour toujours.
+
+WORKERS = int(os.environ.get("LETTRIX_EXPORT_JOB_WORKERS", "1"))
+JOBS_DIR = os.path.join("data", "export_jobs")
+POLL_INTERVAL = 0.5       # secondes entre deux lectures d'une file vide
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5.0         # x numéro de tentative
+LEASE = 300               # "running" depuis plus longtemps -> process perdu
+RESULT_TTL = 3600         # durée de vie du fichier rendu
+PURGE_AFTER = 24 * 3600   # suppression des lignes terminées
+MAX_QUEUED = 200
+MAINTAIN_EVERY = 30
+HEARTBEAT_EVERY = 10      # présence d'un process de traitement
+HEARTBEAT_TTL = 3 * HEARTBEAT_EVERY
+
+QUEUED, RUNNING, DONE, FAILED, EXPIRED = "queued", "running", "done", "failed", "expired"
+
+
+class QueueFull(ServiceUnavailable):
+    description = "Too many pending exports, please retry later."
+
+
+class NoConsumer(ServiceUnavailable):
+    description = "Export jobs are not being processed, please use the direct export."
+
+
+def init(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS export_jobs (
+        id TEXT PRIMARY KEY,
+        target TEXT NOT NULL,
+        args TEXT NOT NULL,
+        download_name TEXT NOT NULL,
+        cache_key TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        artifact TEXT,
+        created REAL NOT NULL,
+        available_at REAL NOT NULL,
+        started REAL,
+        finished REAL
+    )
+    """)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_export_jobs_queue ON export_jobs (status, available_at)"
+    )
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS export_job_workers (
+        worker TEXT PRIMARY KEY,
+        seen REAL NOT NULL
+    )
+    """)
+
+
+_ready = set()
+
+
+def _conn():
+    conn = db.connect()
+    # mini-app lancée seule : la table est créée au premier usage
+    if os.getpid() not in _ready:
+        init(conn.cursor())
+        conn.commit()
+        _ready.add(os.getpid())
+    return conn
+
+
+# ================= FILE =================
+def _consumer_alive(conn):
+    if any(p.is_alive() for p in start_workers()):
+        return True
+    return conn.execute(
+        "SELECT 1 FROM export_job_workers WHERE seen > ? LIMIT 1",
+        (time.time() - HEARTBEAT_TTL,),
+    ).fetchone() is not None
+
+
+def submit(func, args, download_name, cache_key=None):
+    conn = _conn()
+    if not _consumer_alive(conn):
+        print("EXPORT JOBS WARNING: no worker is draining the queue, job refused")
+        raise NoConsumer()
+    pending = conn.execute(
+        "SELECT COUNT(*) FROM export_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+    ).fetchone()[0]
+    if pending >= MAX_QUEUED:
+        raise QueueFull()
+    job_id = secrets.token_urlsafe(16)
+    now = time.time()
+    conn.execute(
+        """INSERT INTO export_jobs
+        (id, target, args, download_name, cache_key, status, created, available_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (job_id, render_pool.target_of(func), json.dumps(args), download_name,
+         cache_key, QUEUED, now, now),
+    )
+    conn.commit()
+    return job_id
+
+
+def get(job_id):
+    return _conn().execute("SELECT * FROM export_jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def describe(row, now=None):
+    now = now or time.time()
+    out = {
+        "id": row["id"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "queued_ms": round(((row["started"] or now) - row["created"]) * 1000),
+    }
+    if row["started"]:
+        out["render_ms"] = round(((row["finished"] or now) - row["started"]) * 1000)
+    if row["error"]:
+        out["error"] = row["error"]
+    return out
+
+
+def claim(conn):
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM export_jobs WHERE status = ? AND available_at <= ? "
+            "ORDER BY available_at LIMIT 1",
+            (QUEUED, now),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE export_jobs SET status = ?, started = ?, finished = NULL, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, now, row["id"]),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if row is None:
+        return None
+    return dict(row, status=RUNNING, started=now, attempts=row["attempts"] + 1)
+
+
+def _artifact_path(job):
+    ext = job["download_name"].rsplit(".", 1)[-1].lower()
+    return os.path.abspath(os.path.join(JOBS_DIR, f"{job['id']}.{ext}"))
+
+
+def run(job):
+    data = export_cache.cache.get(job["cache_key"]) if job["cache_key"] else None
+    if data is None:
+        out = io.BytesIO()
+        render_pool.resolve(job["target"])(*json.loads(job["args"]), output=out)
+        data = out.getvalue()
+        if job["cache_key"]:
+            export_cache.cache.put(job["cache_key"], data)
+    path = _artifact_path(job)
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _finish(conn, job, **fields):
+    # la tentative courante seulement (un job repris après LEASE a changé d'attempts)
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    conn.execute(
+        f"UPDATE export_jobs SET {sets} WHERE id = ? AND attempts = ?",
+        (*fields.values(), job["id"], job["attempts"]),
+    )
+    conn.commit()
+
+
+def process(conn, job):
+    try:
+        path = run(job)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if job["attempts"] < MAX_ATTEMPTS:
+            _finish(conn, job, status=QUEUED, error=error,
+                    available_at=time.time() + RETRY_DELAY * job["attempts"])
+        else:
+            _finish(conn, job, status=FAILED, error=error, finished=time.time())
+        return False
+    _finish(conn, job, status=DONE, artifact=path, error=None, finished=time.time())
+    return True
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def maintain(conn, now=None):
+    now = now or time.time()
+    # process perdu pendant le rendu : nouvelle tentative ou échec
+    conn.execute(
+        "UPDATE export_jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+        "error = 'worker lost', available_at = ?, "
+        "finished = CASE WHEN attempts < ? THEN NULL ELSE ? END "
+        "WHERE status = ? AND started < ?",
+        (MAX_ATTEMPTS, QUEUED, FAILED, now, MAX_ATTEMPTS, now, RUNNING, now - LEASE),
+    )
+    expired = conn.execute(
+        "SELECT id, artifact FROM export_jobs WHERE status = ? AND finished < ?",
+        (DONE, now - RESULT_TTL),
+    ).fetchall()
+    conn.executemany(
+        "UPDATE export_jobs SET status = ?, artifact = NULL WHERE id = ?",
+        [(EXPIRED, r["id"]) for r in expired],
+    )
+    conn.execute(
+        "DELETE FROM export_jobs WHERE status IN (?, ?) AND finished < ?",
+        (EXPIRED, FAILED, now - PURGE_AFTER),
+    )
+    conn.commit()
+    for r in expired:
+        _remove(r["artifact"])
+    return len(expired)
+
+
+# ================= PROCESS DE TRAITEMENT =================
+def _heartbeat(conn, name, now):
+    conn.execute(
+        "INSERT OR REPLACE INTO export_job_workers (worker, seen) VALUES (?, ?)", (name, now)
+    )
+    conn.execute("DELETE FROM export_job_workers WHERE seen < ?", (now - PURGE_AFTER,))
+    conn.commit()
+
+
+def _worker_main(parent_pid=None):
+    # parent_pid=None : process autonome (python export_jobs.py), jamais arrêté
+    # par un changement de parent
+    conn = _conn()
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    last_maintain = last_beat = 0.0
+    # s'arrête si le worker HTTP qui l'a lancé disparaît
+    while parent_pid is None or os.getppid() == parent_pid:
+        now = time.time()
+        if now - last_beat >= HEARTBEAT_EVERY:
+            try:
+                _heartbeat(conn, name, now)
+            except Exception as e:
+                print("EXPORT JOBS HEARTBEAT ERROR:", e)
+            last_beat = now
+        if now - last_maintain >= MAINTAIN_EVERY:
+            try:
+                maintain(conn, now)
+            except Exception as e:
+                print("EXPORT JOBS MAINTAIN ERROR:", e)
+            last_maintain = now
+        try:
+            job = claim(conn)
+        except Exception as e:
+            print("EXPORT JOBS CLAIM ERROR:", e)
+            job = None
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        process(conn, job)
+
+
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+def start_workers(n=WORKERS):
+    global _workers_pid
+    # process enfant (pool de rendu, hachage...), même pendant son import : rien
+    if n <= 0 or multiprocessing.current_process().name != "MainProcess":
+        return _workers
+    with _workers_lock:
+        if _workers_pid != os.getpid():
+            _workers[:] = []
+        # relance les process morts (ou jamais lancés dans ce worker HTTP)
+        _workers[:] = [p for p in _workers if p.is_alive()]
+        if len(_workers) >= n:
+            return _workers
+        ctx = multiprocessing.get_context("spawn")
+        for _ in range(n - len(_workers)):
+            p = ctx.Process(
+                target=_worker_main, args=(os.getpid(),), name="export-jobs", daemon=True
+            )
+            p.start()
+            _workers.append(p)
+        _workers_pid = os.getpid()
+        return _workers
+
+
+# ================= ROUTES (une instance par mini-app) =================
+def blueprint(exports):
+    # exports : {"pdf": (exporteur, type, version, nom_de_fichier(form)), "word": ...}
+    bp = Blueprint("export_jobs", __name__)
+
+    @bp.route("/jobs/export/<fmt>", methods=["POST"])
+    def submit_job(fmt):
+        if fmt not in exports:
+            return jsonify(error="unknown format"), 404
+        form = request.form.to_dict()
+        text = form.get("generated_text", "")
+        if not text:
+            return jsonify(error="No generated text to export."), 400
+        func, kind, version, name_of = exports[fmt]
+        job_id = submit(
+            func, [text, form], name_of(form),
+            cache_key=export_cache.key(kind, version, text, form),
+        )
+        return jsonify(
+            id=job_id,
+            status=QUEUED,
+            status_url=url_for(".job_status", job_id=job_id),
+            download_url=url_for(".job_download", job_id=job_id),
+        ), 202
+
+    @bp.route("/jobs/<job_id>")
+    def job_status(job_id):
+        row = get(job_id)
+        if row is None:
+            return jsonify(error="unknown job"), 404
+        return jsonify(describe(row))
+
+    @bp.route("/jobs/<job_id>/download")
+    def job_download(job_id):
+        row = get(job_id)
+        if row is None:
+            return jsonify(error="unknown job"), 404
+        if row["status"] == EXPIRED:
+            return jsonify(describe(row)), 410
+        if row["status"] != DONE or not row["artifact"] or not os.path.isfile(row["artifact"]):
+            return jsonify(describe(row)), 409
+        ext = row["download_name"].rsplit(".", 1)[-1].lower()
+        return send_file(
+            row["artifact"],
+            as_attachment=True,
+            download_name=row["download_name"],
+            mimetype=MIMETYPES.get(ext, "application/octet-stream"),
+        )
+
+    return bp
+
+
+if __name__ == "__main__":
+    # file vidée par un process séparé : LETTRIX_EXPORT_JOB_WORKERS=0 côté web
+    print("EXPORT JOBS WORKER started")
+    _worker_main(None)
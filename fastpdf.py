@@ -0,0 +1,456 @@
+import os
+import re
+import threading
+
+# ================= FAST SINGLE-PAGE PDF =================
+# Une lettre tient sur une page : inutile de passer par tout doc.build()
+# (gabarits de page, passes de découpe, parseur XML des Paragraph...).
+# build() pose le story directement dans la frame de SimpleDocTemplate
+# (même géométrie, mêmes espacements), sur un canvas créé par le document,
+# avec une coupure de lignes calculée ici pour les paragraphes P(...).
+# Dès que le contenu déborde de la page (ou en cas d'erreur), le canvas
+# est abandonné sans rien écrire et le document est reconstruit par
+# doc.build() avec les vrais Paragraph : même résultat, juste plus lent.
+#
+# Balisage géré : <b>, <font color=...>, <br/>. Tout le reste (entités,
+# autres balises, espace insécable, police non standard, retraits...)
+# fait rendre ce paragraphe par un Paragraph ReportLab, dans la même page.
+#
+# build_batch() fait de même pour N lettres d'un seul type dans un seul
+# document (une lettre par page, signet par destinataire) : polices,
+# filigrane et logo (form / image XObjects) n'y sont écrits qu'une fois.
+
+ENABLED = os.environ.get("LETTRIX_FAST_PDF", "1") != "0"
+# PDF compact (bouton "Compact PDF", compact=1) : logos à 150 dpi, voir logos.for_pdf
+COMPACT_BY_DEFAULT = os.environ.get("LETTRIX_PDF_COMPACT", "0") == "1"
+
+STATS = {"fast": 0, "fallback": 0, "delegated": 0, "batches": 0, "batch_letters": 0}
+
+_stats_lock = threading.Lock()
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        STATS[key] += n
+
+
+def stats():
+    with _stats_lock:
+        return dict(STATS)
+
+
+def compact(metadata):
+    # metadata : formulaire de l'export ; "compact=0" force le mode normal
+    flag = (metadata or {}).get("compact")
+    if flag is None:
+        return COMPACT_BY_DEFAULT
+    return str(flag).strip().lower() not in ("", "0", "false", "no", "off")
+
+
+def _configure():
+    # flux Flate écrits tels quels : la couche ASCII85 (transport 7 bits)
+    # ajoute ~25 % à chaque flux compressé sans rien apporter au téléchargement
+    from reportlab import rl_config
+
+    rl_config.useA85 = 0
+
+
+# ----- paragraphe : texte + style, rendu rapide ou Paragraph -----
+class P:
+    __slots__ = ("text", "style")
+
+    def __init__(self, text, style):
+        self.text = text
+        self.style = style
+
+    def flowable(self):
+        from reportlab.platypus import Paragraph
+
+        return Paragraph(self.text, self.style)
+
+    def fast(self, width, layouts=None):
+        # layouts : cache d'un document (lot) -> un en-tête répété d'une
+        # lettre à l'autre n'est coupé qu'une fois
+        if layouts is None:
+            lines = layout(self.text, self.style, width)
+        else:
+            key = (self.text, id(self.style), width)
+            if key not in layouts:
+                layouts[key] = layout(self.text, self.style, width)
+            lines = layouts[key]
+        if lines is None:
+            _count("delegated")
+            return self.flowable()
+        return _Lines(lines, self.style)
+
+
+_TAG = re.compile(r"<\s*(/?)\s*(\w+)([^>]*?)(/?)\s*>")
+_COLOR_ATTR = re.compile(r"""^\s*color\s*=\s*(['"])([^'"]*)\1\s*$""", re.I)
+_UNSUPPORTED_CHARS = ("&", "<", ">", "\xa0", "\xad")
+_UNSUPPORTED_STYLE = (
+    "leftIndent", "rightIndent", "firstLineIndent", "backColor", "borderWidth",
+    "wordWrap", "endDots", "hyphenationLang", "embeddedHyphenation",
+    "uriWasteReduce", "justifyLastLine", "underline", "strike", "shaping",
+)
+
+
+def _segments(text, style):
+    # -> [[(police, couleur, texte), ...] par ligne forcée (<br/>)] ou None
+    from reportlab.lib.colors import toColor
+    from reportlab.lib.fonts import ps2tt, tt2ps
+
+    family, bold, italic = ps2tt(style.fontName)
+    bolds, colors = [bold], [style.textColor]
+    segments = [[]]
+    pos = 0
+    for m in list(_TAG.finditer(text)) + [None]:
+        chunk = text[pos:m.start() if m else len(text)]
+        if any(c in chunk for c in _UNSUPPORTED_CHARS):
+            return None
+        if chunk:
+            segments[-1].append((tt2ps(family, bolds[-1], italic), colors[-1], chunk))
+        if m is None:
+            break
+        pos = m.end()
+        close, tag, attrs, empty = m.groups()
+        tag = tag.lower()
+        if tag == "br" and not close and not attrs.strip():
+            segments.append([])
+        elif tag == "b" and not attrs.strip() and not empty:
+            if close:
+                if len(bolds) == 1:
+                    return None
+                bolds.pop()
+            else:
+                bolds.append(1)
+        elif tag == "font" and not empty:
+            if close:
+                if len(colors) == 1:
+                    return None
+                colors.pop()
+            else:
+                attr = _COLOR_ATTR.match(attrs)
+                if not attr:
+                    return None
+                colors.append(toColor(attr.group(2)))
+        else:
+            return None
+    if len(bolds) > 1 or len(colors) > 1:
+        return None
+    return segments
+
+
+_metrics = {}
+
+
+def _measure(font):
+    # largeur d'un mot = même calcul que stringWidth pour une police Type1
+    # standard (somme des chasses de l'encodage), sans repasser par
+    # unicode2T1 ; caractère hors encodage : stringWidth
+    measure = _metrics.get(font)
+    if measure is None:
+        from reportlab.pdfbase.pdfmetrics import getFont, stringWidth
+
+        face = getFont(font)
+        widths, encoding = face.widths, face.encName
+
+        def measure(word, size):
+            try:
+                return sum(widths[b] for b in word.encode(encoding)) * 0.001 * size
+            except UnicodeEncodeError:
+                return stringWidth(word, font, size)
+
+        _metrics[font] = measure
+    return measure
+
+
+def layout(text, style, width):
+    # coupure de lignes identique à Paragraph.breakLines (cas simple) :
+    # -> [(police, taille, couleur, x, texte, espacement des mots)] ou None
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+    from reportlab.pdfbase.pdfmetrics import standardFonts
+
+    if any(getattr(style, name, None) for name in _UNSUPPORTED_STYLE) or (
+        getattr(style, "autoLeading", "") not in ("", "off", None)
+        or style.alignment not in (TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY)
+    ):
+        return None
+    try:
+        segments = _segments(text, style)
+    except ValueError:   # police ou couleur inconnue
+        return None
+    if segments is None:
+        return None
+
+    size = style.fontSize
+    broken = []   # (police, couleur, mots, place restante, fin de ligne forcée)
+    for segment in segments:
+        runs = {(font, color) for font, color, chunk in segment if chunk.strip()}
+        if len(runs) > 1:
+            return None   # plusieurs styles sur une même ligne
+        if not runs:
+            broken.append((None, None, [], width, True))
+            continue
+        font, color = runs.pop()
+        if font not in standardFonts:
+            return None
+        words = "".join(chunk for _, _, chunk in segment).split()
+        measure = _measure(font)
+        space = measure(" ", size)
+        shrink = style.spaceShrinkage * space
+        line, current = [], -space
+        for word in words:
+            word_width = measure(word, size)
+            if word_width > width:
+                return None   # mot coupé par splitLongWords
+            new = current + space + word_width
+            if new <= width + shrink * len(line) or not line:
+                line.append(word)
+                current = new
+            else:
+                broken.append((font, color, line, width - current, False))
+                line, current = [word], word_width
+        broken.append((font, color, line, width - current, True))
+
+    if not any(words for _, _, words, _, _ in broken):
+        return None
+    # un <br/> final n'ajoute pas de ligne vide
+    if len(segments) > 1 and not broken[-1][2]:
+        broken.pop()
+
+    lines = []
+    last = len(broken) - 1
+    for i, (font, color, words, extra, forced) in enumerate(broken):
+        x = word_space = 0
+        if extra < -1e-8 and len(words) > 1:
+            # ligne resserrée (spaceShrinkage) : espaces négatifs, quel que
+            # soit l'alignement (voir _leftDrawParaLine & co.)
+            word_space = extra / (len(words) - 1)
+        elif style.alignment == TA_CENTER:
+            x = extra / 2.0
+        elif style.alignment == TA_RIGHT:
+            x = extra
+        elif (style.alignment == TA_JUSTIFY and i != last and not forced
+              and len(words) > 1 and abs(extra) > 1e-8):
+            word_space = extra / (len(words) - 1)
+        lines.append((font, size, color, x, " ".join(words), word_space))
+    return lines
+
+
+class _Lines:
+    # flowable minimal (interface utilisée par Frame.add) : lignes déjà coupées
+    hAlign = "LEFT"
+
+    def __init__(self, lines, style):
+        self.lines = lines
+        self.leading = style.leading
+        self.spaceBefore = style.spaceBefore
+        self.spaceAfter = style.spaceAfter
+        self.width = self.height = 0
+
+    def getSpaceBefore(self):
+        return self.spaceBefore
+
+    def getSpaceAfter(self):
+        return self.spaceAfter
+
+    def wrap(self, availWidth, availHeight):
+        self.width = availWidth
+        self.height = len(self.lines) * self.leading
+        return self.width, self.height
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        canvas.saveState()
+        canvas.translate(x, y)
+        text = canvas.beginText()
+        current_font = current_color = None
+        y = self.height
+        for font, size, color, dx, line, word_space in self.lines:
+            y_line, y = y - size, y - self.leading
+            if not line:
+                continue
+            if (font, size) != current_font:
+                text.setFont(font, size, self.leading)
+                current_font = (font, size)
+            if color != current_color:
+                text.setFillColor(color)
+                current_color = color
+            text.setTextOrigin(dx, y_line)
+            if word_space:
+                text.setWordSpace(word_space)
+                text.textOut(line)
+                text.setWordSpace(0)
+            else:
+                text.textOut(line)
+        canvas.drawText(text)
+        canvas.restoreState()
+
+
+# ----- construction du document -----
+def _flowable(node):
+    return node.flowable() if isinstance(node, P) else node
+
+
+# Uniquement l'API publique de ReportLab (pas de doc._calc / _makeCanvas) :
+# la frame et le canvas sont reconstruits comme ceux de SimpleDocTemplate
+# à partir des attributs publics du document (width / height calculés à
+# sa création, marges, métadonnées).
+FRAME_PADDING = 6   # padding par défaut d'une Frame platypus
+
+
+def _canvas(doc):
+    from reportlab.pdfgen.canvas import Canvas
+
+    canvas = Canvas(
+        doc.filename,
+        pagesize=doc.pagesize,
+        invariant=doc.invariant,
+        pageCompression=doc.pageCompression,
+    )
+    canvas.setAuthor(doc.author)
+    canvas.setTitle(doc.title)
+    canvas.setSubject(doc.subject)
+    canvas.setCreator(doc.creator)
+    canvas.setProducer(doc.producer)
+    canvas.setKeywords(doc.keywords)
+    return canvas
+
+
+def _page(doc, canvas, story, on_page, layouts=None):
+    # une page : décor puis story dans la frame ; False si le story déborde
+    from reportlab.platypus.frames import Frame
+
+    frame = Frame(
+        doc.leftMargin, doc.bottomMargin, doc.width, doc.height,
+        leftPadding=FRAME_PADDING, rightPadding=FRAME_PADDING,
+        topPadding=FRAME_PADDING, bottomPadding=FRAME_PADDING, id="normal",
+    )
+    if on_page is not None:
+        on_page(canvas, doc)
+    width = doc.width - 2 * FRAME_PADDING
+    for node in story:
+        flowable = node.fast(width, layouts) if isinstance(node, P) else node
+        if not frame.add(flowable, canvas):
+            return False
+    canvas.showPage()
+    return True
+
+
+def _single_page(doc, story, on_page):
+    # -> canvas prêt à être enregistré, ou None si le story déborde
+    canvas = _canvas(doc)
+    doc.page = 1
+    return canvas if _page(doc, canvas, story, on_page) else None
+
+
+def build(doc, story, onFirstPage=None, onLaterPages=None):
+    # doc : SimpleDocTemplate ; story : nœuds P et flowables platypus
+    _configure()
+    if ENABLED:
+        try:
+            canvas = _single_page(doc, story, onFirstPage)
+        except Exception as e:
+            print("FAST PDF ERROR:", e)
+            canvas = None
+        if canvas is not None:
+            canvas.save()
+            _count("fast")
+            return
+        _count("fallback")
+
+    kwargs = {}
+    if onFirstPage is not None:
+        kwargs["onFirstPage"] = onFirstPage
+    if onLaterPages is not None:
+        kwargs["onLaterPages"] = onLaterPages
+    doc.build([_flowable(node) for node in story], **kwargs)
+
+
+# ----- plusieurs lettres, un seul document -----
+def shared(cache, key, make):
+    # flowable identique d'une lettre à l'autre d'un lot (logo, libellés
+    # de tableau) : créé une fois par document et redessiné sur chaque
+    # page ; cache None (export simple) -> make() à chaque appel.
+    # Une même instance ne doit apparaître qu'une fois par lettre.
+    if cache is None:
+        return make()
+    flowable = cache.get(key)
+    if flowable is None:
+        flowable = cache[key] = make()
+    return flowable
+
+
+def _bookmark(canvas, n, title):
+    key = f"letter{n}"
+    canvas.bookmarkPage(key)
+    canvas.addOutlineEntry(title, key, level=0)
+
+
+def _one_page_each(doc, letters, outline):
+    # -> canvas (une page par lettre), ou None si une lettre déborde
+    canvas = _canvas(doc)
+    layouts = {}
+    for n, (title, story, on_page) in enumerate(letters, 1):
+        doc.page = n
+        if outline:
+            _bookmark(canvas, n, title or f"Letter {n}")
+        if not _page(doc, canvas, story, on_page, layouts):
+            return None
+    if outline:
+        canvas.showOutline()
+    return canvas
+
+
+def _action(func):
+    # flowable vide qui agit sur le canvas là où doc.build le pose
+    from reportlab.platypus.flowables import CallerMacro
+
+    return CallerMacro(drawCallable=lambda macro: func(macro.canv))
+
+
+def _build_pages(doc, letters, outline):
+    # doc.build : une lettre peut déborder sur plusieurs pages ; le décor
+    # de la lettre suivante est choisi juste avant son saut de page
+    from reportlab.platypus import PageBreak
+
+    current = {"on_page": letters[0][2]}
+
+    def on_page(canvas, doc):
+        if current["on_page"] is not None:
+            current["on_page"](canvas, doc)
+
+    def switch(on_page):
+        return _action(lambda canvas: current.update(on_page=on_page))
+
+    flowables = []
+    for n, (title, story, letter_on_page) in enumerate(letters, 1):
+        if n > 1:
+            flowables += [switch(letter_on_page), PageBreak()]
+        if outline:
+            title = title or f"Letter {n}"
+            flowables.append(_action(lambda canvas, n=n, title=title: _bookmark(canvas, n, title)))
+        flowables += [_flowable(node) for node in story]
+    if outline:
+        flowables.append(_action(lambda canvas: canvas.showOutline()))
+    doc.build(flowables, onFirstPage=on_page, onLaterPages=on_page)
+
+
+def build_batch(doc, letters, outline=True):
+    # letters : [(titre du signet, story, décor de page)], même type de lettre
+    if not letters:
+        raise ValueError("no letters to build")
+    _configure()
+    _count("batches")
+    _count("batch_letters", len(letters))
+    if ENABLED:
+        try:
+            canvas = _one_page_each(doc, letters, outline)
+        except Exception as e:
+            print("FAST PDF ERROR:", e)
+            canvas = None
+        if canvas is not None:
+            canvas.save()
+            _count("fast")
+            return
+        _count("fallback")
+    _build_pages(doc, letters, outline)
@@ -0,0 +1,55 @@
+import hashlib
+import math
+
+# ================= HYPERLOGLOG =================
+# Estimation du nombre de visiteurs uniques en mémoire constante :
+# 2**PRECISION registres d'un octet (4 Ko par jour), erreur ~1.6 %.
+# Deux sketches se fusionnent par max registre à registre, ce qui permet
+# de combiner les workers gunicorn sans jamais stocker d'identifiant.
+
+PRECISION = 12
+
+
+def visitor_key(ip, user_agent):
+    return hashlib.sha256(f"{ip}|{user_agent}".encode("utf-8")).hexdigest()
+
+
+class HyperLogLog:
+    def __init__(self, registers=None, p=PRECISION):
+        self.p = p
+        self.m = 1 << p
+        if registers is not None and len(registers) != self.m:
+            raise ValueError("sketch size mismatch")
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+            return True
+        return False
+
+    def merge(self, other):
+        if isinstance(other, (bytes, bytearray)):
+            other = HyperLogLog(other, self.p)
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # petite cardinalité : comptage linéaire
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def copy(self):
+        return HyperLogLog(self.registers, self.p)
@@ -1,9 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import Flask, render_template, request, redirect, url_for, flash
+import io
 import os
-from werkzeug.utils import secure_filename
+
+import logos
+from bulk import bulk_response, BulkError
+import export_cache
+import export_jobs
+from downloads import pooled, send_export
 
 from .generator import generate_text
-from .utils import export_to_word, export_to_pdf, validate_required_fields
+from .utils import export_to_word, export_to_pdf, export_batch_pdf, validate_required_fields, make_filename, EXPORT_VERSION
 
 # ----- Flask App avec static_url_path pour DispatcherMiddleware -----
 app = Flask(
@@ -59,6 +65,12 @@ def index():
 # ==============================
 #          GENERATE
 # ==============================
+EXTRA_FIELDS = [
+    "applicant_email", "applicant_phone", "why_you_want", "skills",
+    "experience_years", "achievements", "cover_letter_text",
+    "company_email", "company_phone", "company_address"
+]
+
 @app.route("/generate", methods=["POST"])
 def generate():
     form = request.form.to_dict()
@@ -66,25 +78,23 @@ def generate():
     # ----- HANDLE LOGO UPLOAD -----
     file = request.files.get("company_logo_file")
 
-    upload_folder = os.path.join(app.root_path, "static", "uploads")
-    os.makedirs(upload_folder, exist_ok=True)
-
+    logo = None
     if file and file.filename and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        save_path = os.path.join(upload_folder, filename)
-        file.save(save_path)
+        try:
+            # store partagé (data/logos, clé SHA-256) ; logo normalisé 3 cm @ 300 dpi
+            logo = logos.store(file)
+        except logos.LogoError as e:
+            flash(f"Logo ignored: {e}", "warning")
 
-        # POUR HTML
-        form["company_logo"] = f"/job_application/static/uploads/{filename}"
+    if logo:
+        form["company_logo"] = logo["filename"]
 
-        # POUR PDF (CHEMIN DISQUE)
-        form["company_logo_path"] = save_path
+        # POUR PDF : nom dans le store, résolu par logos.resolve à l'export
+        form["company_logo_path"] = logo["filename"]
     else:
-        # fallback sûr
-        default_logo = os.path.join(app.root_path, "static", "logo.png")
-
+        # fallback sûr (relatif à la mini-app)
         form["company_logo"] = "/job_application/static/logo.png"
-        form["company_logo_path"] = default_logo
+        form["company_logo_path"] = "static/logo.png"
 
     # ----- REQUIRED FIELDS -----
     missing = validate_required_fields(form, required=["company_name", "applicant_name"])
@@ -93,16 +103,15 @@ def generate():
         return render_template("index.html", generated_text="", **form)
 
     # ----- EXTRA FIELDS -----
-    for key in [
-        "applicant_email", "applicant_phone", "why_you_want", "skills",
-        "experience_years", "achievements", "cover_letter_text",
-        "company_email", "company_phone", "company_address"
-    ]:
+    for key in EXTRA_FIELDS:
         form[key] = form.get(key, "")
 
     # ----- GENERATE TEXT -----
     result = generate_text(form)
     generated_text = result["full_text"]
+    # graine + indices renvoyés avec le texte : preview / export reproduisent la même lettre
+    form["seed"] = str(result["seed"])
+    form["variant_indices"] = result["variant_indices"]
 
     return render_template("index.html", generated_text=generated_text, **form)
 
@@ -127,8 +136,12 @@ def export_word_route():
     if not text:
         flash("No generated text to export.", "danger")
         return redirect(url_for("index"))
-    filename = export_to_word(text, form)
-    return send_file(filename, as_attachment=True)
+    applicant = form.get("applicant_name", "applicant").replace(" ", "_")
+    return send_export(
+        lambda out: export_to_word(text, form, output=out),
+        f"{applicant}_Job_Application.docx",
+        cache_key=export_cache.key("job_application.docx", EXPORT_VERSION, text, form),
+    )
 
 
 # ==============================
@@ -142,8 +155,51 @@ def export_pdf_route():
         flash("No generated text to export.", "danger")
         return redirect(url_for("index"))
 
-    filename = export_to_pdf(metadata=form, text=text)
-    return send_file(filename, as_attachment=True)
+    applicant = form.get("applicant_name", "").replace(" ", "_")
+    return send_export(
+        pooled(export_to_pdf, text, form),
+        make_filename(applicant or "application", "pdf"),
+        cache_key=export_cache.key("job_application.pdf", EXPORT_VERSION, text, form),
+    )
+
+
+# ==============================
+#     EXPORT JOBS (ASYNC)
+# ==============================
+app.register_blueprint(export_jobs.blueprint({
+    "pdf": (export_to_pdf, "job_application.pdf", EXPORT_VERSION,
+            lambda form: make_filename(form.get("applicant_name", "").replace(" ", "_") or "application", "pdf")),
+    "word": (export_to_word, "job_application.docx", EXPORT_VERSION,
+             lambda form: f"{form.get('applicant_name', 'applicant').replace(' ', '_')}_Job_Application.docx"),
+}))
+
+
+# ==============================
+#     BULK (CSV / JSONL -> ZIP)
+# ==============================
+@app.route("/bulk", methods=["POST"])
+def bulk_route():
+    def text_of(row):
+        for key in EXTRA_FIELDS:
+            row.setdefault(key, "")
+        return generate_text(row)["full_text"]
+
+    def render_row(row, fmt):
+        text = text_of(row)
+        buf = io.BytesIO()
+        (export_to_pdf if fmt == "pdf" else export_to_word)(text, row, output=buf)
+        return buf.getvalue()
+
+    try:
+        return bulk_response(
+            request.files.get("rows_file"), render_row, request.form.get("format", "pdf"),
+            prefix="job_application", name_field="applicant_name",
+            validate=lambda row: validate_required_fields(row, required=["company_name", "applicant_name"]),
+            text_of=text_of, export_batch=export_batch_pdf,
+        )
+    except BulkError as e:
+        flash(f"Bulk export: {e}", "danger")
+        return redirect(url_for("index"))
 
 
 # ==============================
@@ -1,37 +1,29 @@
-import random
 import os
-from datetime import datetime
+
+from dates import DATE_FIELDS, normalize_dates
+from variants import registry, compile_variants, fields_of, select_variants, format_indices, KEEP
 
 BASE_DIR = os.path.dirname(__file__)
 LETTERS_DIR = os.path.join(BASE_DIR, "lettres", "job_application", "english")
 
+# corpus chargé une fois par worker (tuples immuables, rechargé si mtime change)
+registry.preload(LETTERS_DIR)
+
 def load_variants(filename):
-    path = os.path.join(LETTERS_DIR, filename)
-    if not os.path.exists(path):
-        return []
-    with open(path, encoding="utf-8") as f:
-        text = f.read()
-    parts = [p.strip() for p in text.split("\n---\n") if p.strip()]
-    return parts
-
-class SafeDict(dict):
-    def __missing__(self, key):
-        return "{" + key + "}"
-
-def pretty_date(s):
-    if not s:
-        return ""
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
-        try:
-            return datetime.strptime(s, fmt).strftime("%B %d, %Y")
-        except:
-            continue
-    return s
-
-def pick_random(variant_list):
-    if not variant_list:
-        return ""
-    return random.choice(variant_list)
+    return registry.compiled(LETTERS_DIR, filename)
+
+# champs absents : on garde "{champ}" dans le texte
+MISSING = KEEP
+
+FALLBACK_INTROS = compile_variants([
+    "Dear Hiring Manager, my name is {applicant_name}, applying for the position of {position_applied} at {company_name}."
+])
+FALLBACK_BODIES = compile_variants([
+    "I have {experience_years} years of experience, strong skills such as {skills}, and achievements: {achievements}. {why_you_want}"
+])
+FALLBACK_CONCLUSIONS = compile_variants([
+    "I would be grateful for the opportunity to discuss my application further."
+])
 
 def generate_text(user_info):
     intros = load_variants("intro.txts")
@@ -40,31 +32,27 @@ def generate_text(user_info):
 
     # fallback si fichiers vides
     if not intros:
-        intros = [
-            "Dear Hiring Manager, my name is {applicant_name}, applying for the position of {position_applied} at {company_name}."
-        ]
+        intros = FALLBACK_INTROS
     if not bodies:
-        bodies = [
-            "I have {experience_years} years of experience, strong skills such as {skills}, and achievements: {achievements}. {why_you_want}"
-        ]
+        bodies = FALLBACK_BODIES
     if not conclusions:
-        conclusions = [
-            "I would be grateful for the opportunity to discuss my application further."
-        ]
+        conclusions = FALLBACK_CONCLUSIONS
 
-    intro = pick_random(intros)
-    body = pick_random(bodies)
-    conclusion = pick_random(conclusions)
+    # choix reproductible (graine = hash du formulaire ou champ "seed")
+    chosen, indices, seed = select_variants(
+        [("intro", intros), ("body", bodies), ("conclusion", conclusions)], user_info
+    )
+    intro, body, conclusion = chosen["intro"], chosen["body"], chosen["conclusion"]
 
     info = user_info.copy()
 
-    # format signature date
-    if info.get("signature_date"):
-        info["signature_date"] = pretty_date(info["signature_date"])
+    # format dates (seulement celles qu'une variante utilise)
+    needed = fields_of(intro, body, conclusion)
+    normalize_dates(info, [key for key in DATE_FIELDS if key in needed])
 
-    final_intro = intro.format_map(SafeDict(info))
-    final_body = body.format_map(SafeDict(info))
-    final_conclusion = conclusion.format_map(SafeDict(info))
+    final_intro = intro.render(info, MISSING)
+    final_body = body.render(info, MISSING)
+    final_conclusion = conclusion.render(info, MISSING)
 
     parts = [final_intro, "", final_body, "", final_conclusion]
 
@@ -84,5 +72,7 @@ def generate_text(user_info):
         "intro": final_intro,
         "body": final_body,
         "conclusion": final_conclusion,
-        "full_text": full_text
+        "full_text": full_text,
+        "seed": seed,
+        "variant_indices": format_indices(indices)
     }
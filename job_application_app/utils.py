@@ -1,20 +1,14 @@
 import os
 from datetime import datetime
 
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Image,
-    HRFlowable, Table, TableStyle
-)
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
-from reportlab.lib.units import cm
-from reportlab.lib.colors import black, HexColor, Color
-from reportlab.lib.utils import ImageReader
+import decorations
+import fastpdf
+import logos
+
+# version de la mise en page : à incrémenter quand l'export change (clé du cache d'export)
+EXPORT_VERSION = 4
+
+# ReportLab / python-docx sont importés au premier export (voir export_*)
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -31,7 +25,11 @@ def make_filename(prefix, ext):
 
 
 # ---------------- WORD ----------------
-def export_to_word(text, metadata=None):
+def export_to_word(text, metadata=None, output=None):
+    from docx import Document
+    from docx.shared import Pt
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
     metadata = metadata or {}
     applicant = metadata.get("applicant_name", "applicant").replace(" ", "_")
     path = os.path.join(EXPORT_WORD_DIR, f"{applicant}_Job_Application.docx")
@@ -47,34 +45,20 @@ def export_to_word(text, metadata=None):
     style.font.name = "Arial"
     style.font.size = Pt(11)
 
-    doc.save(path)
-    return path
-
-def _watermark(canvas, doc):
-    canvas.saveState()
-    canvas.setFont("Helvetica-Bold", 48)
-    canvas.setFillColor(Color(0.7, 0.7, 0.7, alpha=0.12))
-    canvas.translate(A4[0] / 2, A4[1] / 2)
-    canvas.rotate(45)
-    canvas.drawCentredString(0, 0, "LETTRIX")
-    canvas.restoreState()
+    doc.save(output or path)
+    return output or path
 
+# filigrane en form XObject (voir decorations.py)
+_watermark = decorations.watermark("LETTRIX", 48, (0.7, 0.7, 0.7, 0.12))
 
-def export_to_pdf(text, metadata=None):
-    metadata = metadata or {}
-
-    logo_path = metadata.get("company_logo_path")
-    company_name = metadata.get("company_name", "")
-    company_address = metadata.get("company_address", "")
-    company_email = metadata.get("company_email", "")
-    company_phone = metadata.get("company_phone", "")
-    applicant_name = metadata.get("applicant_name", "")
 
-    filename = make_filename(applicant_name.replace(" ", "_") or "application", "pdf")
-    path = os.path.join(EXPORT_PDF_DIR, filename)
+def _pdf_doc(target):
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
 
-    doc = SimpleDocTemplate(
-        path,
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         leftMargin=2*cm,
         rightMargin=2*cm,
@@ -82,18 +66,13 @@ def export_to_pdf(text, metadata=None):
         bottomMargin=2*cm
     )
 
-    story = []
 
-    # -------- LOGO --------
-    if logo_path and os.path.isfile(logo_path):
-        img = ImageReader(logo_path)
-        iw, ih = img.getSize()
-        w = 3 * cm
-        h = w * ih / iw
-        story.append(Image(logo_path, width=w, height=h))
-        story.append(Spacer(1, 12))
+def _pdf_styles():
+    # une fois par document (partagés par toutes les lettres d'un lot)
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
+    from reportlab.lib.colors import HexColor
 
-    # -------- STYLES --------
     title = ParagraphStyle(
         "title",
         fontSize=16,
@@ -137,11 +116,52 @@ def export_to_pdf(text, metadata=None):
         alignment=TA_RIGHT
     )
 
+    sign_name = ParagraphStyle(
+        "sign_name",
+        fontSize=10,
+        alignment=TA_RIGHT,
+        fontName="Helvetica-Bold"
+    )
+    return title, meta, section_title, body, footer, sign_style, sign_name
+
+
+def _pdf_story(text, metadata, styles, cache=None):
+    # cache : flowables partagés entre les lettres d'un lot (voir fastpdf.shared)
+    from reportlab.platypus import Spacer, Image, HRFlowable
+    from reportlab.lib.units import cm
+    from reportlab.lib.colors import HexColor
+
+    metadata = metadata or {}
+    title, meta, section_title, body, footer, sign_style, sign_name = styles
+
+    logo_path = logos.resolve(metadata.get("company_logo_path"), BASE_DIR)
+    company_name = metadata.get("company_name", "")
+    company_address = metadata.get("company_address", "")
+    company_email = metadata.get("company_email", "")
+    company_phone = metadata.get("company_phone", "")
+    applicant_name = metadata.get("applicant_name", "")
+
+    story = []
+
+    # -------- LOGO --------
+    # dimensions lues dans le .json écrit à l'upload (voir logos.py)
+    logo_size = logos.size_of(logo_path) if logo_path else None
+    if logo_size:
+        iw, ih = logo_size
+        w = 3 * cm
+        h = w * ih / iw
+        compact = fastpdf.compact(metadata)
+        story.append(fastpdf.shared(
+            cache, ("logo", logo_path, compact),
+            lambda: Image(logos.for_pdf(logo_path, compact), width=w, height=h),
+        ))
+        story.append(Spacer(1, 12))
+
     # -------- HEADER --------
-    story.append(Paragraph(company_name, title))
+    story.append(fastpdf.P(company_name, title))
     story.append(Spacer(1, 8))
 
-    story.append(Paragraph(
+    story.append(fastpdf.P(
         "<br/>".join(filter(None, [
             company_address,
             f"Email: {company_email}" if company_email else "",
@@ -160,39 +180,61 @@ def export_to_pdf(text, metadata=None):
     story.append(Spacer(1, 20))  # ✅ TEXTE DESCEND BIEN
 
     # -------- JOB APPLICATION TITLE --------
-    story.append(Paragraph("JOB APPLICATION", section_title))
+    story.append(fastpdf.P("JOB APPLICATION", section_title))
     story.append(Spacer(1, 18))
 
     # -------- LETTER BODY --------
     for p in text.split("\n\n"):
-        story.append(Paragraph(p.replace("\n", "<br/>"), body))
+        story.append(fastpdf.P(p.replace("\n", "<br/>"), body))
         story.append(Spacer(1, 10))
 
     # -------- SIGNATURE --------
     story.append(Spacer(1, 35))
-    story.append(Paragraph("Signature: .....................................", sign_style))
+    story.append(fastpdf.P("Signature: .....................................", sign_style))
     story.append(Spacer(1, 10))
-    story.append(Paragraph(applicant_name, ParagraphStyle(
-        "sign_name",
-        fontSize=10,
-        alignment=TA_RIGHT,
-        fontName="Helvetica-Bold"
-    )))
+    story.append(fastpdf.P(applicant_name, sign_name))
 
     # -------- FOOTER TEXT --------
     story.append(Spacer(1, 40))
-    story.append(Paragraph(
+    story.append(fastpdf.P(
         "This letter was generated automatically by Lettrix-WE",
         footer
     ))
 
-    doc.build(
+    return story, _watermark
+
+
+def export_to_pdf(text, metadata=None, output=None):
+    applicant_name = (metadata or {}).get("applicant_name", "")
+    filename = make_filename(applicant_name.replace(" ", "_") or "application", "pdf")
+    path = os.path.join(EXPORT_PDF_DIR, filename)
+
+    doc = _pdf_doc(output or path)
+    story, on_page = _pdf_story(text, metadata, _pdf_styles())
+    fastpdf.build(
+        doc,
         story,
-        onFirstPage=_watermark,
-        onLaterPages=_watermark
+        onFirstPage=on_page,
+        onLaterPages=on_page
     )
 
-    return path
+    return output or path
+
+
+def export_batch_pdf(letters, output=None, outline=True):
+    # letters : [(texte, metadata)] -> un seul PDF, une lettre par page,
+    # un signet par candidat (outline=False : sans signets)
+    path = os.path.join(EXPORT_PDF_DIR, make_filename("applications_batch", "pdf"))
+
+    doc = _pdf_doc(output or path)
+    styles, cache = _pdf_styles(), {}
+    batch = []
+    for text, metadata in letters:
+        story, on_page = _pdf_story(text, metadata, styles, cache)
+        batch.append(((metadata or {}).get("applicant_name", ""), story, on_page))
+    fastpdf.build_batch(doc, batch, outline=outline)
+
+    return output or path
 
 
 def validate_required_fields(data, required):
@@ -0,0 +1,60 @@
+import importlib
+import os
+import threading
+import time
+
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+# ================= LAZY MINI-APP MOUNTS =================
+# Chaque mini-app (ReportLab, python-docx, makedirs...) n'est importée
+# qu'à la première requête sous son préfixe. LETTRIX_WARM_MOUNTS liste
+# les préfixes à charger dès le démarrage du worker ("*" = tous).
+
+WARM_MOUNTS = os.environ.get("LETTRIX_WARM_MOUNTS", "")
+
+IMPORT_TIMES = {}
+
+
+class LazyApp:
+    def __init__(self, prefix, target):
+        self.prefix = prefix
+        self.target = target  # "package.module:attribut"
+        self._app = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._app is None:
+                module_name, attr = self.target.split(":")
+                t = time.perf_counter()
+                app = getattr(importlib.import_module(module_name), attr)
+                elapsed = (time.perf_counter() - t) * 1000
+                IMPORT_TIMES[self.prefix] = round(elapsed, 1)
+                print(f"MOUNT {self.prefix} ({self.target}) imported in {elapsed:.1f} ms")
+                self._app = app
+        return self._app
+
+    @property
+    def loaded(self):
+        return self._app is not None
+
+    def __call__(self, environ, start_response):
+        app = self._app or self.load()
+        return app(environ, start_response)
+
+
+def parse_warm(value):
+    return [p.strip() for p in value.split(",") if p.strip()]
+
+
+def lazy_dispatcher(app, mounts, warm=None):
+    lazy = {prefix: LazyApp(prefix, target) for prefix, target in mounts.items()}
+    warm = parse_warm(WARM_MOUNTS) if warm is None else list(warm)
+    if "*" in warm:
+        warm = list(lazy)
+    for prefix in warm:
+        if prefix in lazy:
+            lazy[prefix].load()
+        else:
+            print("MOUNT unknown warm prefix:", prefix)
+    return DispatcherMiddleware(app, lazy)
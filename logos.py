@@ -0,0 +1,423 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ================= LOGO NORMALIZATION =================
+# Les logos sont décodés une seule fois, à l'upload : réduits à la taille
+# imprimée maximale (3 cm à 300 dpi), redressés selon l'EXIF, aplatis si
+# l'alpha est inutile, puis ré-encodés en PNG ou JPEG (le plus petit).
+# Les dimensions sont écrites à côté (<fichier>.json) : les exports ne
+# relisent jamais l'original ni l'en-tête de l'image.
+
+MAX_CM = 3.0
+DPI = 300
+MAX_PX = round(MAX_CM / 2.54 * DPI)  # 354 px
+COMPACT_DPI = 150
+COMPACT_PX = round(MAX_CM / 2.54 * COMPACT_DPI)  # 177 px, PDF compact
+MAX_INPUT_PIXELS = 40_000_000        # au-delà : refus (image piège)
+JPEG_QUALITY = 88
+
+_sizes = {}  # chemin -> (mtime_ns, (largeur, hauteur))
+_embeds = OrderedDict()  # (chemin, mtime_ns, max_px) -> octets réduits
+EMBED_CACHE = 64
+_lock = threading.Lock()
+
+
+class LogoError(ValueError):
+    pass
+
+
+def _has_alpha(img):
+    if img.mode in ("RGBA", "LA"):
+        lo, _ = img.getchannel("A").getextrema()
+        return lo < 255
+    return False
+
+
+def normalize(stream, max_px=MAX_PX):
+    # stream : fichier binaire (upload Flask, BytesIO...) -> (octets, ext, l, h)
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        img = Image.open(stream)
+        if img.width * img.height > MAX_INPUT_PIXELS:
+            raise LogoError("image too large")
+        # JPEG : décodage directement à une échelle réduite
+        img.draft("RGB", (max_px, max_px))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise LogoError("not a readable image")
+
+    if img.mode == "P" and "transparency" in img.info:
+        img = img.convert("RGBA")
+    elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+    img.thumbnail((max_px, max_px), Image.LANCZOS)
+
+    if _has_alpha(img):
+        out = io.BytesIO()
+        img.save(out, "PNG", optimize=True)
+        return out.getvalue(), "png", img.width, img.height
+
+    # alpha absent ou entièrement opaque : aplati, puis le plus petit des deux
+    img = img.convert("L" if img.mode in ("L", "LA") else "RGB")
+    png, jpeg = io.BytesIO(), io.BytesIO()
+    img.save(png, "PNG", optimize=True)
+    img.save(jpeg, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    if len(jpeg.getvalue()) < len(png.getvalue()):
+        return jpeg.getvalue(), "jpg", img.width, img.height
+    return png.getvalue(), "png", img.width, img.height
+
+
+def _write(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _save(path, data, width, height):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write(path, data)
+    _write(path + ".json", json.dumps({"width": width, "height": height}).encode())
+
+
+# ================= CONTENT-ADDRESSED STORE =================
+# Un seul dossier pour toutes les mini-apps : data/logos/<aa>/<sha256>.<ext>.
+# La clé est le SHA-256 de l'upload d'origine, calculé pendant la lecture
+# du flux : un logo déjà connu ne coûte ni décodage ni écriture de fichier.
+# La table "logos" garde le dernier usage (upload ou export, voir resolve)
+# et un simple compteur d'uploads (refs, statistique) ; gc() ne se fie qu'à
+# l'âge : supprime ce qui n'a pas servi depuis RETENTION et tient le
+# dossier sous MAX_STORE_BYTES (les plus anciens d'abord).
+
+STORE_DIR = os.path.join("data", "logos")
+CHUNK = 64 * 1024
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+RETENTION = 30 * 24 * 3600        # secondes sans usage avant suppression
+MAX_STORE_BYTES = 200 * 1024 * 1024
+MIN_AGE = 3600                    # jamais supprimé avant (formulaires en cours)
+GC_INTERVAL = 3600
+TOUCH_INTERVAL = 3600             # last_used rafraîchi au plus une fois par heure
+
+_ready = set()
+
+
+def init(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS logos (
+        digest TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        width INTEGER NOT NULL,
+        height INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        refs INTEGER NOT NULL DEFAULT 1,
+        created INTEGER NOT NULL,
+        last_used INTEGER NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_logos_last_used ON logos (last_used)")
+
+
+def _conn():
+    import db
+
+    conn = db.connect()
+    # mini-app lancée seule : la table est créée au premier usage
+    if os.getpid() not in _ready:
+        init(conn.cursor())
+        conn.commit()
+        _ready.add(os.getpid())
+    return conn
+
+
+def _spool(stream):
+    # hash SHA-256 pendant la lecture, copie en mémoire (petit) ou sur disque
+    import tempfile
+
+    digest = hashlib.sha256()
+    buf = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    total = 0
+    while True:
+        chunk = stream.read(CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > MAX_UPLOAD_BYTES:
+            buf.close()
+            raise LogoError("file too large")
+        digest.update(chunk)
+        buf.write(chunk)
+    buf.seek(0)
+    return digest.hexdigest(), buf
+
+
+def object_path(name):
+    return os.path.abspath(os.path.join(STORE_DIR, name[:2], name))
+
+
+def _is_object_name(name):
+    digest, _, ext = name.partition(".")
+    return len(digest) == 64 and ext in ("png", "jpg") and all(
+        c in "0123456789abcdef" for c in digest
+    )
+
+
+def _entry(digest, name, width, height):
+    return {
+        "digest": digest, "filename": name, "path": object_path(name),
+        "width": width, "height": height,
+    }
+
+
+def store(file):
+    # file : FileStorage (ou tout objet avec .stream) -> entrée du store
+    digest, buf = _spool(file.stream)
+    now = int(time.time())
+    conn = _conn()
+    with buf:
+        row = conn.execute(
+            "SELECT name, width, height FROM logos WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row and os.path.isfile(object_path(row["name"])):
+            conn.execute(
+                "UPDATE logos SET refs = refs + 1, last_used = ? WHERE digest = ?",
+                (now, digest),
+            )
+            conn.commit()
+            return _entry(digest, row["name"], row["width"], row["height"])
+
+        data, ext, width, height = normalize(buf)
+
+    name = f"{digest}.{ext}"
+    _save(object_path(name), data, width, height)
+    conn.execute(
+        """INSERT INTO logos (digest, name, width, height, bytes, refs, created, last_used)
+        VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT(digest) DO UPDATE SET
+            name = excluded.name, width = excluded.width, height = excluded.height,
+            bytes = excluded.bytes, refs = refs + 1, last_used = excluded.last_used""",
+        (digest, name, width, height, len(data), now, now),
+    )
+    conn.commit()
+    return _entry(digest, name, width, height)
+
+
+def _unlink(path):
+    for p in (path, path + ".json"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def gc(now=None):
+    # 1) entrées expirées, 2) budget disque (LRU), 3) fichiers orphelins
+    now = int(now or time.time())
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        victims = [r["name"] for r in conn.execute(
+            "SELECT name FROM logos WHERE last_used < ?", (now - RETENTION,)
+        )]
+        total = conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM logos WHERE last_used >= ?",
+            (now - RETENTION,),
+        ).fetchone()[0]
+        if total > MAX_STORE_BYTES:
+            for r in conn.execute(
+                "SELECT name, bytes FROM logos WHERE last_used >= ? AND last_used < ? "
+                "ORDER BY last_used",
+                (now - RETENTION, now - MIN_AGE),
+            ):
+                if total <= MAX_STORE_BYTES:
+                    break
+                victims.append(r["name"])
+                total -= r["bytes"]
+        conn.executemany("DELETE FROM logos WHERE name = ?", [(n,) for n in victims])
+        known = {r["name"] for r in conn.execute("SELECT name FROM logos")}
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for name in victims:
+        _unlink(object_path(name))
+
+    orphans = 0
+    if os.path.isdir(STORE_DIR):
+        for sub in os.scandir(STORE_DIR):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                name = entry.name
+                if name.endswith((".json", ".tmp")) or name in known:
+                    continue
+                if entry.stat().st_mtime < now - MIN_AGE:
+                    _unlink(entry.path)
+                    orphans += 1
+            try:
+                os.rmdir(sub.path)  # seulement s'il est vide
+            except OSError:
+                pass
+    return {"deleted": len(victims), "orphans": orphans, "bytes": total}
+
+
+def stats():
+    row = _conn().execute(
+        "SELECT COUNT(*) AS n, COALESCE(SUM(bytes), 0) AS bytes, "
+        "COALESCE(SUM(refs), 0) AS refs FROM logos"
+    ).fetchone()
+    return {"logos": row["n"], "bytes": row["bytes"], "uploads": row["refs"]}
+
+
+def start_gc(interval=GC_INTERVAL):
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                gc()
+            except Exception as e:
+                print("LOGO GC ERROR:", e)
+
+    threading.Thread(target=run, name="logos-gc", daemon=True).start()
+    return stop
+
+
+# ================= RÉSOLUTION (exports) =================
+# Les formulaires ne transportent que le nom du logo dans le store
+# (<sha256>.<ext>). Un chemin posté n'est accepté que si, une fois résolu
+# (realpath, liens suivis), il mène dans le store ou dans un dossier
+# static/ de l'application (logo par défaut, uploads d'avant le store) :
+# jamais un fichier quelconque du serveur.
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_touched = {}  # digest -> dernier rafraîchissement de last_used (ce process)
+
+
+def _inside(path, root):
+    root = os.path.realpath(root)
+    return path == root or path.startswith(root + os.sep)
+
+
+def _allowed(path):
+    if _inside(path, STORE_DIR):
+        return True
+    return _inside(path, os.path.join(APP_ROOT, "static")) or any(
+        _inside(path, os.path.join(APP_ROOT, entry.name, "static"))
+        for entry in os.scandir(APP_ROOT) if entry.is_dir()
+    )
+
+
+def touch(digest, now=None):
+    # un export compte comme un usage : le GC garde les logos encore servis
+    now = int(now or time.time())
+    with _lock:
+        if now - _touched.get(digest, 0) < TOUCH_INTERVAL:
+            return
+        _touched[digest] = now
+    try:
+        conn = _conn()
+        conn.execute("UPDATE logos SET last_used = ? WHERE digest = ?", (now, digest))
+        conn.commit()
+    except Exception as e:
+        print("LOGO TOUCH ERROR:", e)
+
+
+def resolve(value, base=APP_ROOT):
+    # value : nom dans le store, ou chemin (relatif à base) -> chemin réel ou None
+    value = (value or "").strip()
+    if not value:
+        return None
+    if _is_object_name(value):
+        path = os.path.realpath(object_path(value))
+    else:
+        path = os.path.realpath(os.path.join(base, value))
+    if not os.path.isfile(path):
+        return None
+    if not _allowed(path):
+        print("LOGO REFUSED:", value)
+        return None
+    name = os.path.basename(path)
+    if _is_object_name(name) and path == os.path.realpath(object_path(name)):
+        touch(name.split(".", 1)[0])
+    return path
+
+
+def size_of(path):
+    # dimensions d'un logo normalisé ; repli Pillow pour les anciens fichiers
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _sizes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        size = (int(meta["width"]), int(meta["height"]))
+    except (OSError, ValueError, KeyError):
+        from PIL import Image
+
+        try:
+            with Image.open(path) as img:
+                size = img.size
+        except OSError:
+            return None
+
+    with _lock:
+        _sizes[path] = (mtime, size)
+    return size
+
+
+def for_pdf(path, compact=False):
+    # -> source d'image pour ReportLab : le fichier tel quel s'il ne dépasse
+    # pas la taille imprimée (uploads normalisés), sinon une copie réduite
+    # une fois par process (anciens fichiers de static/uploads, mode compact)
+    max_px = COMPACT_PX if compact else MAX_PX
+    size = size_of(path)
+    if size is None or max(size) <= max_px:
+        return path
+    key = (path, os.stat(path).st_mtime_ns, max_px)
+    with _lock:
+        data = _embeds.get(key)
+        if data is not None:
+            _embeds.move_to_end(key)
+    if data is None:
+        try:
+            with open(path, "rb") as f:
+                data = normalize(f, max_px)[0]
+        except LogoError as e:
+            print("LOGO RESIZE ERROR:", path, e)
+            return path
+        with _lock:
+            _embeds[key] = data
+            while len(_embeds) > EMBED_CACHE:
+                _embeds.popitem(last=False)
+    return io.BytesIO(data)
+
+
+def fingerprint(path):
+    # identité du contenu d'un logo pour les clés de cache d'export :
+    # digest du store si possible, sinon taille + mtime du fichier
+    if not path:
+        return ""
+    name = os.path.basename(path)
+    digest = name.split(".", 1)[0]
+    if _is_object_name(name) and (path == name or os.path.abspath(path) == object_path(name)):
+        return digest
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
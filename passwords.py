@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# ================= PASSWORD HASHING POOL =================
+# Le hachage (scrypt / pbkdf2) est volontairement coûteux : on le sort du
+# worker HTTP vers un petit pool de process. Au-delà de MAX_PENDING jobs
+# en attente, on refuse tout de suite (429) au lieu d'empiler les requêtes.
+
+# profil de coût (format werkzeug) ; un changement déclenche un rehash au login
+HASH_METHOD = os.environ.get("LETTRIX_HASH_METHOD", "scrypt:32768:8:1")
+POOL_SIZE = int(os.environ.get("LETTRIX_HASH_WORKERS", "2"))
+MAX_PENDING = int(os.environ.get("LETTRIX_HASH_QUEUE", "8"))
+HASH_TIMEOUT = 10.0
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn : pas de fork d'un worker qui a déjà des threads
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _drop_pool(pool):
+    # process du pool tué (OOM, signal) : l'exécuteur est inutilisable
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(fn, *args):
+    pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except Exception as e:
+        _slots.release()
+        if isinstance(e, BrokenProcessPool):
+            _drop_pool(pool)
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeout:
+        raise HashingBusy()
+    except BrokenProcessPool:
+        _drop_pool(pool)
+        raise
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return _submit(fn, *args)
+    except BrokenProcessPool:
+        pass
+    # une seule nouvelle tentative, sur un pool recréé
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    return _submit(fn, *args)
+
+
+def hash_password(password, method=None):
+    return _run(generate_password_hash, password, method or HASH_METHOD)
+
+
+def verify_password(stored_hash, password):
+    return _run(check_password_hash, stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    return stored_hash.split("$", 1)[0] != HASH_METHOD
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
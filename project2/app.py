@@ -1,9 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import Flask, render_template, request, redirect, url_for, flash
+import io
 import os
-from werkzeug.utils import secure_filename
+
+import logos
+from bulk import bulk_response, BulkError
+import export_cache
+import export_jobs
+from downloads import pooled, send_export
 
 from .generator import generate_leave_text
-from .utils import export_to_word_leave, export_leave_pdf, validate_required_fields
+from .utils import export_to_word_leave, export_leave_pdf, export_leave_batch_pdf, validate_required_fields, make_filename, EXPORT_VERSION
 
 # ----- Flask App avec static_url_path pour DispatcherMiddleware -----
 app = Flask(
@@ -43,31 +49,27 @@ def index():
 # ==============================
 #          GENERATE
 # ==============================
+# Champs obligatoires
+REQUIRED_FIELDS = [
+    "employee_full_name", "position", "company_name", "supervisor_name",
+    "leave_type", "start_date", "end_date", "total_days", "reason", "submission_date"
+]
+
 @app.route("/generate_leave", methods=["POST"])
 def generate():
     form = request.form.to_dict()
 
     file = request.files.get("company_logo_file")
+    form["company_logo"] = ""
     if file and allowed_file(file.filename) and file.filename.strip():
-        filename = secure_filename(file.filename)
-        upload_folder = os.path.join(app.root_path, "static", "uploads")
-        os.makedirs(upload_folder, exist_ok=True)
-
-        save_path = os.path.join(upload_folder, filename)
-        file.save(save_path)
-
-        # 🔴 CHEMIN DISQUE RELATIF POUR ReportLab
-        form["company_logo"] = os.path.join("static", "uploads", filename).replace("\\", "/")
-    else:
-        form["company_logo"] = ""
-
-    # Champs obligatoires
-    required = [
-        "employee_full_name", "position", "company_name", "supervisor_name",
-        "leave_type", "start_date", "end_date", "total_days", "reason", "submission_date"
-    ]
-
-    missing = validate_required_fields(form, required)
+        try:
+            # store partagé (data/logos, clé SHA-256) ; logo normalisé 3 cm @ 300 dpi
+            # 🔴 NOM DANS LE STORE, RÉSOLU PAR logos.resolve À L'EXPORT
+            form["company_logo"] = logos.store(file)["filename"]
+        except logos.LogoError as e:
+            flash(f"Logo ignored: {e}", "warning")
+
+    missing = validate_required_fields(form, REQUIRED_FIELDS)
     if missing:
         flash(f"Missing required fields: {', '.join(missing)}", "danger")
         return render_template("index_leave.html", generated_text="", fields=form, **form)
@@ -101,8 +103,11 @@ def export_word_route():
     if not text:
         flash("No generated text to export.", "danger")
         return redirect(url_for("index"))
-    filename = export_to_word_leave(text, form)
-    return send_file(filename, as_attachment=True)
+    return send_export(
+        lambda out: export_to_word_leave(text, form, output=out),
+        make_filename("leave_request", "docx"),
+        cache_key=export_cache.key("leave.docx", EXPORT_VERSION, text, form),
+    )
 
 
 # ==============================
@@ -115,8 +120,48 @@ def export_pdf_route():
     if not text:
         flash("No generated text to export.", "danger")
         return redirect(url_for("index"))
-    filename = export_leave_pdf(text, form)
-    return send_file(filename, as_attachment=True)
+    return send_export(
+        pooled(export_leave_pdf, text, form),
+        make_filename("leave_request", "pdf"),
+        cache_key=export_cache.key("leave.pdf", EXPORT_VERSION, text, form),
+    )
+
+
+# ==============================
+#     EXPORT JOBS (ASYNC)
+# ==============================
+app.register_blueprint(export_jobs.blueprint({
+    "pdf": (export_leave_pdf, "leave.pdf", EXPORT_VERSION,
+            lambda form: make_filename("leave_request", "pdf")),
+    "word": (export_to_word_leave, "leave.docx", EXPORT_VERSION,
+             lambda form: make_filename("leave_request", "docx")),
+}))
+
+
+# ==============================
+#     BULK (CSV / JSONL -> ZIP)
+# ==============================
+@app.route("/bulk_leave", methods=["POST"])
+def bulk_route():
+    def text_of(row):
+        return generate_leave_text(row)["full_text"]
+
+    def render_row(row, fmt):
+        text = text_of(row)
+        buf = io.BytesIO()
+        (export_leave_pdf if fmt == "pdf" else export_to_word_leave)(text, row, output=buf)
+        return buf.getvalue()
+
+    try:
+        return bulk_response(
+            request.files.get("rows_file"), render_row, request.form.get("format", "pdf"),
+            prefix="leave_request", name_field="employee_full_name",
+            validate=lambda row: validate_required_fields(row, REQUIRED_FIELDS),
+            text_of=text_of, export_batch=export_leave_batch_pdf,
+        )
+    except BulkError as e:
+        flash(f"Bulk export: {e}", "danger")
+        return redirect(url_for("index"))
 
 
 # ==============================
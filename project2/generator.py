@@ -1,27 +1,8 @@
-from datetime import datetime
-
-
-class SafeDict(dict):
-    def __missing__(self, key):
-        return "{" + key + "}"
-
-
-def pretty_date(s):
-    if not s:
-        return ""
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
-        try:
-            return datetime.strptime(s, fmt).strftime("%B %d, %Y")
-        except:
-            continue
-    return s
+from dates import normalize_dates
 
 
 def generate_leave_text(user_info):
-    info = user_info.copy()
-    info["start_date"] = pretty_date(info.get("start_date"))
-    info["end_date"] = pretty_date(info.get("end_date"))
-    info["submission_date"] = pretty_date(info.get("submission_date"))
+    info = normalize_dates(user_info.copy())
 
     parts = []
     parts.append(f"To: {info.get('supervisor_name', '')}")
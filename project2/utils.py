@@ -1,27 +1,14 @@
 import os, datetime
-from docx import Document
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, HRFlowable
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_RIGHT
-from reportlab.lib.units import cm
-from reportlab.lib.colors import HexColor, Color
-from reportlab.lib.pagesizes import A4
 
-import os, datetime
-from docx import Document
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, HRFlowable
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_RIGHT
-from reportlab.lib.units import cm
-from reportlab.lib.colors import HexColor, Color
-from reportlab.lib.pagesizes import A4
-import os, datetime
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, HRFlowable
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_RIGHT
-from reportlab.lib.units import cm
-from reportlab.lib.colors import HexColor, Color
-from reportlab.lib.pagesizes import A4
+import decorations
+import fastpdf
+import logos
+
+# version de la mise en page : à incrémenter quand l'export change (clé du cache d'export)
+EXPORT_VERSION = 4
+
+# ReportLab / python-docx sont importés au premier export (voir export_*)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 EXPORT_WORD_DIR = os.path.join(BASE_DIR, "export", "word")
@@ -30,11 +17,16 @@ EXPORT_PDF_DIR = os.path.join(BASE_DIR, "export", "pdf")
 os.makedirs(EXPORT_WORD_DIR, exist_ok=True)
 os.makedirs(EXPORT_PDF_DIR, exist_ok=True)
 
+# ========= WATERMARK (form XObject, voir decorations.py) =========
+WATERMARK = decorations.watermark("LETTRIX – WEB", 55, (0.6, 0.6, 0.6, 0.12))
+
 def make_filename(prefix="document", ext="pdf"):
     ts = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     return f"{prefix}_{ts}.{ext}"
 
-def export_to_word_leave(text, metadata=None):
+def export_to_word_leave(text, metadata=None, output=None):
+    from docx import Document
+
     doc = Document()
     doc.add_heading("LEAVE REQUEST LETTER", level=1)
     for line in text.split("\n"):
@@ -44,18 +36,17 @@ def export_to_word_leave(text, metadata=None):
             doc.add_paragraph(line)
     filename = make_filename("leave_request","docx")
     path = os.path.join(EXPORT_WORD_DIR, filename)
-    doc.save(path)
-    return path
+    doc.save(output or path)
+    return output or path
 
 
-def export_leave_pdf(text, metadata=None):
-    metadata = metadata or {}
+def _pdf_doc(target):
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.units import cm
+    from reportlab.lib.pagesizes import A4
 
-    filename = f"leave_request_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-    path = os.path.join(EXPORT_PDF_DIR, filename)
-
-    doc = SimpleDocTemplate(
-        path,
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         leftMargin=2*cm,
         rightMargin=2*cm,
@@ -63,7 +54,12 @@ def export_leave_pdf(text, metadata=None):
         bottomMargin=2*cm
     )
 
-    story = []
+
+def _pdf_styles():
+    # une fois par document (partagés par toutes les lettres d'un lot)
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
+    from reportlab.lib.colors import HexColor
 
     # ========= STYLES (NOMS UNIQUES) =========
     company_header_style = ParagraphStyle(
@@ -99,36 +95,49 @@ def export_leave_pdf(text, metadata=None):
         textColor=HexColor("#888888"),
         spaceBefore=12
     )
+    return company_header_style, company_address_style, body_style, footer_style
+
+
+def _pdf_story(text, metadata, styles, cache=None):
+    # cache : flowables partagés entre les lettres d'un lot (voir fastpdf.shared)
+    from reportlab.platypus import Spacer, Image, HRFlowable
+    from reportlab.lib.units import cm
+    from reportlab.lib.colors import HexColor
+
+    metadata = metadata or {}
+    company_header_style, company_address_style, body_style, footer_style = styles
+
+    story = []
 
     # ========= LOGO =========
     logo_web_path = metadata.get("company_logo", "").strip()
 
     if logo_web_path:
-        # Transformer le chemin web en chemin disque réel
-        if logo_web_path.startswith("/"):
-            logo_disk_path = os.path.join(BASE_DIR, logo_web_path.lstrip("/"))
-        else:
-            logo_disk_path = os.path.join(BASE_DIR, logo_web_path)
+        # nom dans le store, ou chemin web -> chemin disque réel (contrôlé par logos)
+        logo_disk_path = logos.resolve(logo_web_path.lstrip("/"), BASE_DIR)
 
-        logo_disk_path = os.path.abspath(logo_disk_path)
+        compact = fastpdf.compact(metadata)
 
-        if os.path.exists(logo_disk_path):
-            logo = Image(logo_disk_path, width=3 * cm, height=3 * cm)
+        def make_logo():
+            logo = Image(logos.for_pdf(logo_disk_path, compact), width=3 * cm, height=3 * cm)
             logo.hAlign = "RIGHT"
-            story.append(logo)
+            return logo
+
+        if logo_disk_path:
+            story.append(fastpdf.shared(cache, ("logo", logo_disk_path, compact), make_logo))
             story.append(Spacer(1, 12))
         else:
-            print("LOGO NOT FOUND:", logo_disk_path)  # debug
+            print("LOGO NOT FOUND:", logo_web_path)  # debug
 
     # ========= HEADER VISUEL =========
     company_name = metadata.get("company_name", "").strip()
     company_address = metadata.get("company_address", "").strip()
 
     if company_name:
-        story.append(Paragraph(company_name, company_header_style))
+        story.append(fastpdf.P(company_name, company_header_style))
 
     if company_address:
-        story.append(Paragraph(company_address, company_address_style))
+        story.append(fastpdf.P(company_address, company_address_style))
 
     story.append(
         HRFlowable(
@@ -144,28 +153,43 @@ def export_leave_pdf(text, metadata=None):
     for p in text.split("\n\n"):
         p = p.strip()
         if p:
-            story.append(Paragraph(p.replace("\n", "<br/>"), body_style))
+            story.append(fastpdf.P(p.replace("\n", "<br/>"), body_style))
 
     # ========= FOOTER =========
     story.append(Spacer(1, 20))
     story.append(HRFlowable(width="100%", thickness=0.5, color=HexColor("#cccccc")))
-    story.append(Paragraph(
+    story.append(fastpdf.P(
         "Generated with LETTRIX – WEB",
         footer_style
     ))
 
-    # ========= WATERMARK =========
-    def watermark(canvas, doc):
-        canvas.saveState()
-        canvas.setFont("Helvetica-Bold", 55)
-        canvas.setFillColor(Color(0.6, 0.6, 0.6, alpha=0.12))
-        canvas.translate(A4[0]/2, A4[1]/2)
-        canvas.rotate(45)
-        canvas.drawCentredString(0, 0, "LETTRIX – WEB")
-        canvas.restoreState()
-
-    doc.build(story, onFirstPage=watermark, onLaterPages=watermark)
-    return path
+    return story, WATERMARK
+
+
+def export_leave_pdf(text, metadata=None, output=None):
+    filename = f"leave_request_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+    path = os.path.join(EXPORT_PDF_DIR, filename)
+
+    doc = _pdf_doc(output or path)
+    story, on_page = _pdf_story(text, metadata, _pdf_styles())
+    fastpdf.build(doc, story, onFirstPage=on_page, onLaterPages=on_page)
+    return output or path
+
+
+def export_leave_batch_pdf(letters, output=None, outline=True):
+    # letters : [(texte, metadata)] -> un seul PDF, une lettre par page,
+    # un signet par salarié (outline=False : sans signets)
+    filename = f"leave_request_batch_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+    path = os.path.join(EXPORT_PDF_DIR, filename)
+
+    doc = _pdf_doc(output or path)
+    styles, cache = _pdf_styles(), {}
+    batch = []
+    for text, metadata in letters:
+        story, on_page = _pdf_story(text, metadata, styles, cache)
+        batch.append(((metadata or {}).get("employee_full_name", ""), story, on_page))
+    fastpdf.build_batch(doc, batch, outline=outline)
+    return output or path
 
 
 def validate_required_fields(data: dict, required=None):
@@ -1,9 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import Flask, render_template, request, redirect, url_for, flash
+import io
 import os
-from werkzeug.utils import secure_filename
+
+import logos
+from bulk import bulk_response, BulkError
+import export_cache
+import export_jobs
+from downloads import pooled, send_export
 
 from .generator import generate_text
-from .utils import export_to_word, export_to_pdf, validate_required_fields
+from .utils import export_to_word, export_to_pdf, export_batch_pdf, validate_required_fields, make_filename, EXPORT_VERSION
 
 # ----- Flask App avec static_url_path pour DispatcherMiddleware -----
 app = Flask(
@@ -47,35 +53,42 @@ def index():
     )
 
 # ----------------- GENERATE -----------------
+REQUIRED_FIELDS = ["applicant_name", "email", "company_name", "internship_position"]
+
 @app.route("/generate", methods=["POST"])
 def generate():
     form = request.form.to_dict()
 
     # --- Upload du logo ---
     file = request.files.get("company_logo_file")
+    logo = None
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        upload_path = os.path.join("static/uploads", filename)
-        file.save(upload_path)
-        # ⚡ On met le chemin relatif correct pour utils.py
-        form["company_logo"] = upload_path.replace("\\", "/")
+        try:
+            # store partagé (data/logos, clé SHA-256) ; logo normalisé 3 cm @ 300 dpi
+            logo = logos.store(file)
+        except logos.LogoError as e:
+            flash(f"Logo ignored: {e}", "warning")
+    if logo:
+        # ⚡ nom dans le store, résolu par logos.resolve à l'export
+        form["company_logo"] = logo["filename"]
     else:
         form["company_logo"] = form.get("company_logo", "static/logo.png")
 
     # --- Champs obligatoires ---
-    missing = validate_required_fields(
-        form,
-        required=["applicant_name", "email", "company_name", "internship_position"]
-    )
+    missing = validate_required_fields(form, required=REQUIRED_FIELDS)
     if missing:
         flash(f"Missing required fields: {', '.join(missing)}", "danger")
         return render_template("index.html", generated_text="", **form)
 
     # --- Génération du texte automatique ---
-    generated_text = generate_text(form)["full_text"]
+    result = generate_text(form)
+    generated_text = result["full_text"]
+    # graine + indices renvoyés avec le texte : preview / export reproduisent la même lettre
+    form["seed"] = str(result["seed"])
+    form["variant_indices"] = result["variant_indices"]
 
-    # ⚡ Ajouter chemin absolu du logo pour export PDF
-    form["company_logo_path"] = os.path.abspath(form["company_logo"])
+    # ⚡ Logo pour export PDF (nom du store ou chemin relatif à la mini-app)
+    form["company_logo_path"] = form["company_logo"]
 
     return render_template("index.html", generated_text=generated_text, **form)
 
@@ -95,16 +108,53 @@ def preview():
 def export_word_route():
     form = request.form.to_dict()
     text = form.get("generated_text", "")
-    filepath = export_to_word(text, form)
-    return send_file(filepath, as_attachment=True)
+    return send_export(
+        lambda out: export_to_word(text, form, output=out),
+        make_filename("internship", "docx"),
+        cache_key=export_cache.key("internship.docx", EXPORT_VERSION, text, form),
+    )
 
 # ----------------- EXPORT PDF -----------------
 @app.route("/export/pdf", methods=["POST"])
 def export_pdf_route():
     form = request.form.to_dict()
     text = form.get("generated_text", "")
-    filepath = export_to_pdf(text, form)
-    return send_file(filepath, as_attachment=True)
+    return send_export(
+        pooled(export_to_pdf, text, form),
+        make_filename("internship", "pdf"),
+        cache_key=export_cache.key("internship.pdf", EXPORT_VERSION, text, form),
+    )
+
+# ----------------- EXPORT JOBS (ASYNC) -----------------
+app.register_blueprint(export_jobs.blueprint({
+    "pdf": (export_to_pdf, "internship.pdf", EXPORT_VERSION,
+            lambda form: make_filename("internship", "pdf")),
+    "word": (export_to_word, "internship.docx", EXPORT_VERSION,
+             lambda form: make_filename("internship", "docx")),
+}))
+
+# ----------------- BULK (CSV / JSONL -> ZIP) -----------------
+@app.route("/bulk", methods=["POST"])
+def bulk_route():
+    def text_of(row):
+        return generate_text(row)["full_text"]
+
+    def render_row(row, fmt):
+        text = text_of(row)
+        buf = io.BytesIO()
+        (export_to_pdf if fmt == "pdf" else export_to_word)(text, row, output=buf)
+        return buf.getvalue()
+
+    try:
+        return bulk_response(
+            request.files.get("rows_file"), render_row, request.form.get("format", "pdf"),
+            prefix="internship", name_field="applicant_name",
+            validate=lambda row: validate_required_fields(row, required=REQUIRED_FIELDS),
+            text_of=text_of, export_batch=export_batch_pdf,
+        )
+    except BulkError as e:
+        flash(f"Bulk export: {e}", "danger")
+        return redirect(url_for("index"))
 
 # ----------------- DEV LOCAL -----------------
 if __name__ == "__main__":
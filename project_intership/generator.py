@@ -1,54 +1,57 @@
-import random
 import os
-from datetime import datetime
+from datetime import date
+
+from dates import normalize_dates
+from variants import registry, compile_variants, select_variants, format_indices, BLANK
 
 BASE_DIR = os.path.dirname(__file__)
 LETTERS_DIR = os.path.join(BASE_DIR, "lettres", "internship_application", "english")
 
+# corpus chargé une fois par worker (tuples immuables, rechargé si mtime change)
+registry.preload(LETTERS_DIR)
+
 def load_variants(filename):
-    path = os.path.join(LETTERS_DIR, filename)
-    if not os.path.exists(path):
-        return []
-    with open(path, encoding="utf-8") as f:
-        return [p.strip() for p in f.read().split("\n---\n") if p.strip()]
-
-class SafeDict(dict):
-    def __missing__(self, key):
-        return ""
-
-def pretty_date(s):
-    if not s:
-        return datetime.now().strftime("%B %d, %Y")
-    try:
-        return datetime.strptime(s, "%Y-%m-%d").strftime("%B %d, %Y")
-    except:
-        return s
+    return registry.compiled(LETTERS_DIR, filename)
 
-def generate_text(info):
-    info["date"] = pretty_date(info.get("date"))
+# champs absents : remplacés par une chaîne vide
+MISSING = BLANK
+
+FALLBACK_INTROS = compile_variants([
+    "I am writing to apply for the {internship_position} internship position at {company_name}."
+])
 
-    intro = load_variants("intro.txts") or [
-        "I am writing to apply for the {internship_position} internship position at {company_name}."
-    ]
+FALLBACK_BODIES = compile_variants([
+    "I am currently a {current_level} student in {field_of_study} at {university}. "
+    "I am highly motivated to gain practical experience through this internship.\n\n"
+    "{motivation}\n\n"
+    "My key skills include: {key_skills}.\n"
+    "Relevant academic projects or experiences: {academic_projects}.\n"
+    "I am available for an internship duration of: {internship_duration}."
+])
+
+FALLBACK_CONCLUSIONS = compile_variants([
+    "I would be grateful for the opportunity to further discuss my application."
+])
+
+def generate_text(info):
+    intro = load_variants("intro.txts") or FALLBACK_INTROS
+    body = load_variants("body.txts") or FALLBACK_BODIES
+    conclusion = load_variants("conclusion.txts") or FALLBACK_CONCLUSIONS
 
-    body = load_variants("body.txts") or [
-        "I am currently a {current_level} student in {field_of_study} at {university}. "
-        "I am highly motivated to gain practical experience through this internship.\n\n"
-        "{motivation}\n\n"
-        "My key skills include: {key_skills}.\n"
-        "Relevant academic projects or experiences: {academic_projects}.\n"
-        "I am available for an internship duration of: {internship_duration}."
-    ]
+    # choix reproductible, calculé avant d'ajouter la date du jour
+    chosen, indices, seed = select_variants(
+        [("intro", intro), ("body", body), ("conclusion", conclusion)], info
+    )
 
-    conclusion = load_variants("conclusion.txts") or [
-        "I would be grateful for the opportunity to further discuss my application."
-    ]
+    # date vide -> date du jour
+    info["date"] = info.get("date") or date.today().isoformat()
+    normalize_dates(info, ("date",))
 
     full_text = "\n\n".join([
-        random.choice(intro).format_map(SafeDict(info)),
-        random.choice(body).format_map(SafeDict(info)),
-        random.choice(conclusion).format_map(SafeDict(info)),
+        chosen["intro"].render(info, MISSING),
+        chosen["body"].render(info, MISSING),
+        chosen["conclusion"].render(info, MISSING),
         "\nSincerely,\n" + info.get("applicant_name", "")
     ])
 
-    return {"full_text": full_text}
+    return {"full_text": full_text, "seed": seed, "variant_indices": format_indices(indices)}
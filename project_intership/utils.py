@@ -1,14 +1,14 @@
 import os
 from datetime import datetime
-from docx import Document
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
-from reportlab.lib.units import cm
-from reportlab.lib.colors import HexColor
-from reportlab.lib.utils import ImageReader
+import decorations
+import fastpdf
+import logos
+
+# version de la mise en page : à incrémenter quand l'export change (clé du cache d'export)
+EXPORT_VERSION = 4
+
+# ReportLab / python-docx sont importés au premier export (voir export_*)
 
 
 # ===============================
@@ -31,10 +31,99 @@ def make_filename(prefix, ext):
     return f"{prefix}_{ts}.{ext}"
 
 
+# ===============================
+#        HEADER + WATERMARK
+# ===============================
+# Dessinés en form XObjects (voir decorations.py) : le filigrane est
+# commun à toutes les lettres, l'en-tête est mis en cache par hash de son
+# contenu (textes + fichier logo), logo décodé une seule fois.
+WATERMARK = decorations.watermark("LETTRIX – WEB", 60, "#E6E6E6")
+
+
+def _draw_letterhead(canvas, cache, content):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.utils import ImageReader
+
+    company_name, company_address, email, phone, logo, compact = content
+    w, h = A4
+    top_y = h - 2.5 * cm
+
+    # ---- LOGO ----
+    if logo:
+        try:
+            if "logo" not in cache:
+                cache["logo"] = ImageReader(logos.for_pdf(logo[0], compact))
+            reader = cache["logo"]
+            iw, ih = reader.getSize()
+            lw = 3 * cm
+            lh = lw * ih / iw
+            canvas.drawImage(
+                reader,
+                2 * cm,
+                top_y - lh + 2 * cm,  # ⬆️ logo légèrement plus haut
+                lw,
+                lh,
+                mask="auto",
+            )
+
+        except Exception:
+            pass
+
+    # ---- COMPANY NAME (OPTIONAL) ----
+    if company_name:
+        canvas.setFont("Helvetica-Bold", 15)
+        canvas.setFillColor(HexColor("#1f3c88"))
+        canvas.drawCentredString(w / 2, top_y, company_name)
+
+    # ---- ADDRESS ----
+    if company_address:
+        canvas.setFont("Helvetica", 10)
+        canvas.setFillColor(HexColor("#444444"))
+        canvas.drawCentredString(w / 2, top_y - 18, company_address)
+
+    # ---- BLUE LINE ----
+    canvas.setStrokeColor(HexColor("#1f3c88"))
+    canvas.setLineWidth(1.5)
+    canvas.line(
+        2 * cm, top_y - 32, w - 2 * cm, top_y - 32
+    )
+
+    # ---- RECIPIENT INFO ----
+    canvas.setFont("Helvetica", 9)
+    canvas.setFillColor(HexColor("#F4B400"))
+    RIGHT_y = top_y - 55
+
+    if email:
+        canvas.drawString(2 * cm, RIGHT_y, email)
+        RIGHT_y -= 12
+
+    if phone:
+        canvas.drawString(2 * cm, RIGHT_y, phone)
+
+
+def letterhead(meta):
+    logo = decorations.file_signature(logos.resolve(meta.get("company_logo_path"), BASE_DIR))
+    content = (
+        meta.get("company_name") or "",
+        meta.get("company_address") or "",
+        meta.get("email") or "",
+        meta.get("phone") or "",
+        logo,
+        bool(logo) and fastpdf.compact(meta),   # sans logo : même en-tête
+    )
+    return decorations.letterhead(
+        content, lambda canvas, cache: _draw_letterhead(canvas, cache, content)
+    )
+
+
 # ===============================
 #        WORD
 # ===============================
-def export_to_word(text, meta):
+def export_to_word(text, meta, output=None):
+    from docx import Document
+
     path = os.path.join(
         EXPORT_WORD_DIR, make_filename("internship", "docx")
     )
@@ -45,20 +134,20 @@ def export_to_word(text, meta):
     for line in text.split("\n"):
         doc.add_paragraph(line)
 
-    doc.save(path)
-    return path
+    doc.save(output or path)
+    return output or path
 
 
 # ===============================
 #        PDF
 # ===============================
-def export_to_pdf(text, meta):
-    path = os.path.join(
-        EXPORT_PDF_DIR, make_filename("internship", "pdf")
-    )
+def _pdf_doc(target):
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
 
-    doc = SimpleDocTemplate(
-        path,
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         leftMargin=2 * cm,
         rightMargin=2 * cm,
@@ -66,6 +155,13 @@ def export_to_pdf(text, meta):
         bottomMargin=3 * cm,
     )
 
+
+def _pdf_styles():
+    # une fois par document (partagés par toutes les lettres d'un lot)
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+    from reportlab.lib.colors import HexColor
+
     # -------- Styles --------
     body_style = ParagraphStyle(
         "body", fontSize=11, leading=15, alignment=TA_JUSTIFY
@@ -95,27 +191,34 @@ def export_to_pdf(text, meta):
         alignment=TA_CENTER,
         textColor=HexColor("#777777"),
     )
+    return body_style, title_style, signature_style, footer_style
+
+
+def _pdf_story(text, meta, styles):
+    from reportlab.platypus import Spacer
+
+    body_style, title_style, signature_style, footer_style = styles
 
     story = []
 
     # ---- LETTER TITLE (PLACED CORRECTLY) ----
     story.append(Spacer(1, 5))
     story.append(
-        Paragraph("INTERNSHIP APPLICATION LETTER", title_style)
+        fastpdf.P("INTERNSHIP APPLICATION LETTER", title_style)
     )
 
     # ---- LETTER BODY ----
     for p in text.split("\n\n"):
         if p.strip():
             story.append(
-                Paragraph(p.replace("\n", "<br/>"), body_style)
+                fastpdf.P(p.replace("\n", "<br/>"), body_style)
             )
             story.append(Spacer(1, 10))
 
     # ---- SIGNATURE ----
     story.append(Spacer(1, 30))
     story.append(
-        Paragraph(
+        fastpdf.P(
             "<b>Signature :</b><br/><br/>"
             "..............................................................",
             signature_style,
@@ -125,7 +228,7 @@ def export_to_pdf(text, meta):
     # ---- FOOTER ----
     story.append(Spacer(1, 40))
     story.append(
-        Paragraph(
+        fastpdf.P(
             "This letter was generated professionally using LETTRIX – WEB.",
             footer_style,
         )
@@ -134,88 +237,43 @@ def export_to_pdf(text, meta):
     # ===============================
     #        HEADER + WATERMARK
     # ===============================
-    def draw_header(canvas, doc):
-        canvas.saveState()
-        w, h = A4
-        top_y = h - 2.5 * cm
-
-        # ---- WATERMARK ----
-        canvas.saveState()
-        canvas.setFont("Helvetica-Bold", 60)
-        canvas.setFillColor(HexColor("#E6E6E6"))
-        canvas.translate(w / 2, h / 2)
-        canvas.rotate(45)
-        canvas.drawCentredString(0, 0, "LETTRIX – WEB")
-        canvas.restoreState()
-
-        # ---- LOGO ----
-        logo_path = meta.get("company_logo_path")
-        if logo_path and os.path.isfile(logo_path):
-            try:
-                logo = ImageReader(logo_path)
-                iw, ih = logo.getSize()
-                lw = 3 * cm
-                lh = lw * ih / iw
-                canvas.drawImage(
-                    logo,
-                    2 * cm,
-                    top_y - lh + 2 * cm,  # ⬆️ logo légèrement plus haut
-                    lw,
-                    lh,
-                    mask="auto",
-                )
-
-            except Exception:
-                pass
-
-        # ---- COMPANY NAME (OPTIONAL) ----
-        if meta.get("company_name"):
-            canvas.setFont("Helvetica-Bold", 15)
-            canvas.setFillColor(HexColor("#1f3c88"))
-            canvas.drawCentredString(
-                w / 2, top_y, meta.get("company_name")
-            )
+    return story, decorations.combine(WATERMARK, letterhead(meta))
 
-        # ---- ADDRESS ----
-        if meta.get("company_address"):
-            canvas.setFont("Helvetica", 10)
-            canvas.setFillColor(HexColor("#444444"))
-            canvas.drawCentredString(
-                w / 2, top_y - 18, meta.get("company_address")
-            )
-
-        # ---- BLUE LINE ----
-        canvas.setStrokeColor(HexColor("#1f3c88"))
-        canvas.setLineWidth(1.5)
-        canvas.line(
-            2 * cm, top_y - 32, w - 2 * cm, top_y - 32
-        )
-
-        # ---- RECIPIENT INFO ----
-        canvas.setFont("Helvetica", 9)
-        canvas.setFillColor(HexColor("#F4B400"))
-        RIGHT_y = top_y - 55
-
-        if meta.get("email"):
-            canvas.drawString(
-                2 * cm, RIGHT_y, meta.get("email")
-            )
-            RIGHT_y -= 12
 
-        if meta.get("phone"):
-            canvas.drawString(
-                2 * cm, RIGHT_y, meta.get("phone")
-            )
+def export_to_pdf(text, meta, output=None):
+    path = os.path.join(
+        EXPORT_PDF_DIR, make_filename("internship", "pdf")
+    )
 
-        canvas.restoreState()
+    doc = _pdf_doc(output or path)
+    story, draw_header = _pdf_story(text, meta, _pdf_styles())
 
-    doc.build(
+    fastpdf.build(
+        doc,
         story,
         onFirstPage=draw_header,
         onLaterPages=draw_header,
     )
 
-    return path
+    return output or path
+
+
+def export_batch_pdf(letters, output=None, outline=True):
+    # letters : [(texte, meta)] -> un seul PDF, une lettre par page,
+    # un signet par candidat (outline=False : sans signets)
+    path = os.path.join(
+        EXPORT_PDF_DIR, make_filename("internship_batch", "pdf")
+    )
+
+    doc = _pdf_doc(output or path)
+    styles = _pdf_styles()
+    batch = []
+    for text, meta in letters:
+        story, draw_header = _pdf_story(text, meta, styles)
+        batch.append((meta.get("applicant_name", ""), story, draw_header))
+    fastpdf.build_batch(doc, batch, outline=outline)
+
+    return output or path
 
 
 # ===============================
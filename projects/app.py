@@ -1,6 +1,13 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash
+import io
 import os
-from .util import export_to_word, export_to_pdf  # assure-toi que utils.py est dans le même dossier
+
+import logos
+from bulk import bulk_response, BulkError
+import export_cache
+import export_jobs
+from downloads import pooled, send_export
+from .util import export_to_word, export_to_pdf, export_batch_pdf, EXPORT_VERSION  # assure-toi que utils.py est dans le même dossier
 
 # ----- Flask App avec static_url_path pour DispatcherMiddleware -----
 app = Flask(
@@ -40,21 +47,8 @@ def index():
                            fields={})
 
 # ----------------- GENERATE -----------------
-@app.route("/generate", methods=["POST"])
-def generate():
-    form = request.form.to_dict()
-
-    file = request.files.get("company_logo_file")
-    if file and allowed_file(file.filename) and file.filename.strip():
-        filename = file.filename.replace(" ", "_")
-        path = os.path.join("static/uploads", filename)
-        file.save(path)
-        # On renvoie le chemin relatif pour utils.py
-        form["company_logo"] = path.replace("\\", "/")
-    else:
-        form["company_logo"] = "static/logo.png"  # logo par défaut
-
-    generated_text = f"""
+def build_letter_text(form):
+    return f"""
 {form.get('company_name','')}
 Email: {form.get('company_email','')} | Phone: {form.get('company_phone','')}
 
@@ -79,6 +73,22 @@ I am willing to assist with the transition: {form.get('transition_help','')}
 Sincerely,
 {form.get('employee_full_name','')}
 """
+
+@app.route("/generate", methods=["POST"])
+def generate():
+    form = request.form.to_dict()
+
+    file = request.files.get("company_logo_file")
+    form["company_logo"] = "static/logo.png"  # logo par défaut
+    if file and allowed_file(file.filename) and file.filename.strip():
+        try:
+            # store partagé (data/logos, clé SHA-256) ; logo normalisé 3 cm @ 300 dpi
+            # On renvoie le chemin disque pour utils.py
+            form["company_logo"] = logos.store(file)["filename"]
+        except logos.LogoError as e:
+            flash(f"Logo ignored: {e}", "warning")
+
+    generated_text = build_letter_text(form)
     fields = form.copy()
     fields["generated_text"] = generated_text
 
@@ -101,15 +111,49 @@ def preview():
 def export_word_route():
     fields = request.form.to_dict()
     text = fields.get("generated_text", "")
-    path = export_to_word(text, metadata=fields)
-    return send_file(path, as_attachment=True)
+    return send_export(
+        lambda out: export_to_word(text, metadata=fields, output=out),
+        "resignation_letter.docx",
+        cache_key=export_cache.key("resignation.docx", EXPORT_VERSION, text, fields),
+    )
 
 @app.route("/export_pdf_route", methods=["POST"])
 def export_pdf_route():
     fields = request.form.to_dict()
     text = fields.get("generated_text", "")
-    path = export_to_pdf(text, metadata=fields)
-    return send_file(path, as_attachment=True)
+    return send_export(
+        pooled(export_to_pdf, text, fields),
+        "resignation_letter.pdf",
+        cache_key=export_cache.key("resignation.pdf", EXPORT_VERSION, text, fields),
+    )
+
+# ----------------- EXPORT JOBS (ASYNC) -----------------
+app.register_blueprint(export_jobs.blueprint({
+    "pdf": (export_to_pdf, "resignation.pdf", EXPORT_VERSION,
+            lambda form: "resignation_letter.pdf"),
+    "word": (export_to_word, "resignation.docx", EXPORT_VERSION,
+             lambda form: "resignation_letter.docx"),
+}))
+
+# ----------------- BULK (CSV / JSONL -> ZIP) -----------------
+@app.route("/bulk", methods=["POST"])
+def bulk_route():
+    def render_row(row, fmt):
+        text = build_letter_text(row)
+        buf = io.BytesIO()
+        (export_to_pdf if fmt == "pdf" else export_to_word)(text, metadata=row, output=buf)
+        return buf.getvalue()
+
+    try:
+        return bulk_response(
+            request.files.get("rows_file"), render_row, request.form.get("format", "pdf"),
+            prefix="resignation", name_field="employee_full_name",
+            validate=lambda row: [k for k in ("company_name", "employee_full_name") if not row.get(k)],
+            text_of=build_letter_text, export_batch=export_batch_pdf,
+        )
+    except BulkError as e:
+        flash(f"Bulk export: {e}", "danger")
+        return redirect(url_for("index"))
 
 # ----------------- DEV LOCAL -----------------
 if __name__ == "__main__":
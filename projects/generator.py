@@ -1,24 +1,23 @@
-import random, os
-from datetime import datetime
+import os
+
+from dates import normalize_dates
+from variants import registry, compile_variants, select_variants, format_indices, KEEP
 
 BASE_DIR = os.path.dirname(__file__)
 LETTERS_DIR = os.path.join(BASE_DIR, "lettres", "resignation_letter", "english")
 
-def load_variants(name):
-    path = os.path.join(LETTERS_DIR, name)
-    if not os.path.exists(path):
-        return []
-    return [p.strip() for p in open(path, encoding="utf-8").read().split("\n---\n") if p.strip()]
+# corpus chargé une fois par worker (tuples immuables, rechargé si mtime change)
+registry.preload(LETTERS_DIR)
+
+def load_variants(filename):
+    return registry.compiled(LETTERS_DIR, filename)
 
-class SafeDict(dict):
-    def __missing__(self, key):
-        return "{" + key + "}"
+# champs absents : on garde "{champ}" dans le texte
+MISSING = KEEP
 
-def pretty_date(s):
-    try:
-        return datetime.strptime(s, "%Y-%m-%d").strftime("%B %d, %Y")
-    except:
-        return s
+FALLBACK_INTROS = compile_variants(["Please accept this letter as formal notice of my resignation from my position as {current_job_title} at {company_name}."])
+FALLBACK_BODIES = compile_variants(["My resignation will be effective on {last_working_day}. {reason_for_resignation}"])
+FALLBACK_CONCLUSIONS = compile_variants(["Thank you for the opportunity to work at {company_name}. {transition_help}"])
 
 def generate_text(data):
     intros = load_variants("intro.txts")
@@ -26,21 +25,26 @@ def generate_text(data):
     conclusions = load_variants("conclusion.txts")
 
     if not intros:
-        intros = ["Please accept this letter as formal notice of my resignation from my position as {current_job_title} at {company_name}."]
+        intros = FALLBACK_INTROS
 
     if not bodies:
-        bodies = ["My resignation will be effective on {last_working_day}. {reason_for_resignation}"]
+        bodies = FALLBACK_BODIES
 
     if not conclusions:
-        conclusions = ["Thank you for the opportunity to work at {company_name}. {transition_help}"]
+        conclusions = FALLBACK_CONCLUSIONS
 
     info = data.copy()
-    info["letter_date"] = pretty_date(info.get("letter_date",""))
-    info["last_working_day"] = pretty_date(info.get("last_working_day",""))
-
-    intro = random.choice(intros).format_map(SafeDict(info))
-    body = random.choice(bodies).format_map(SafeDict(info))
-    concl = random.choice(conclusions).format_map(SafeDict(info))
+    # dates absentes : vides dans le texte (pas de "{letter_date}")
+    for key in ("letter_date", "last_working_day"):
+        info[key] = info.get(key) or ""
+    normalize_dates(info)
+
+    chosen, indices, seed = select_variants(
+        [("intro", intros), ("body", bodies), ("conclusion", conclusions)], data
+    )
+    intro = chosen["intro"].render(info, MISSING)
+    body = chosen["body"].render(info, MISSING)
+    concl = chosen["conclusion"].render(info, MISSING)
 
     full_text = f"{intro}\n\n{body}\n\n{concl}\n\nSincerely,\n{info.get('employee_full_name','')}"
-    return {"full_text": full_text}
+    return {"full_text": full_text, "seed": seed, "variant_indices": format_indices(indices)}
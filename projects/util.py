@@ -1,16 +1,13 @@
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.colors import HexColor, Color
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-)
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-from reportlab.lib.units import mm
 
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+import decorations
+import fastpdf
+import logos
+
+# version de la mise en page : à incrémenter quand l'export change (clé du cache d'export)
+EXPORT_VERSION = 4
+
+# ReportLab / python-docx sont importés au premier export (voir export_*)
 
 
 # ==============================
@@ -29,37 +26,31 @@ os.makedirs(EXPORT_WORD, exist_ok=True)
 # ==============================
 #        COLORS
 # ==============================
-BLUE = HexColor("#0d6efd")
-YELLOW = HexColor("#FFD700")
-BLACK = HexColor("#000000")
-WATERMARK = Color(0.6, 0.6, 0.6, alpha=0.15)
+BLUE = "#0d6efd"
+YELLOW = "#FFD700"
+BLACK = "#000000"
+WATERMARK = (0.6, 0.6, 0.6, 0.15)  # r, g, b, alpha
 
 
 # ==============================
 #        WATERMARK
 # ==============================
-def draw_watermark(canvas, doc):
-    canvas.saveState()
-    canvas.setFont("Helvetica-Bold", 60)
-    canvas.setFillColor(WATERMARK)
-    canvas.translate(300, 400)
-    canvas.rotate(45)
-    canvas.drawCentredString(0, 0, "RESIGNATION LETTER")
-    canvas.restoreState()
+# form XObject partagé : une définition par document, un "Do" par page
+draw_watermark = decorations.watermark(
+    "RESIGNATION LETTER", 60, WATERMARK, origin=(300, 400)
+)
 
 
 # ==============================
 #        PDF EXPORT
 # ==============================
-def export_to_pdf(text, metadata=None):
-    metadata = metadata or {}
-    path = os.path.join(EXPORT_PDF, "resignation_letter.pdf")
+def _pdf_doc(target):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.units import mm
 
-    if os.path.exists(path):
-        os.remove(path)
-
-    doc = SimpleDocTemplate(
-        path,
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         rightMargin=25 * mm,
         leftMargin=25 * mm,
@@ -67,6 +58,28 @@ def export_to_pdf(text, metadata=None):
         bottomMargin=20 * mm,
     )
 
+
+def _pdf_styles():
+    # une fois par document (partagés par toutes les lettres d'un lot)
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
+
+    return {
+        "company": ParagraphStyle("h", fontSize=14),
+        "contact": ParagraphStyle("e", fontSize=9),
+        "title": ParagraphStyle("title", fontSize=16, alignment=TA_CENTER),
+        "body": ParagraphStyle("body", fontSize=11, leading=15),
+        "signature": ParagraphStyle("sig", alignment=TA_RIGHT),
+    }
+
+
+def _pdf_story(text, metadata, styles, cache=None):
+    # cache : flowables partagés entre les lettres d'un lot (voir fastpdf.shared)
+    from reportlab.lib.colors import HexColor
+    from reportlab.platypus import Paragraph, Spacer, Image, Table, TableStyle
+    from reportlab.lib.units import mm
+
+    metadata = metadata or {}
     elements = []
 
     # -------- METADATA --------
@@ -79,28 +92,31 @@ def export_to_pdf(text, metadata=None):
     logo_url = metadata.get("company_logo", "").strip()
 
     if logo_url:
-        # convert URL -> disk path
-        logo_url = logo_url.replace("/projects/", "").lstrip("/")
-        logo_path = os.path.join(PROJECT_ROOT, logo_url)
+        # nom dans le store, ou ancienne URL -> chemin disque (contrôlé par logos)
+        logo_path = logos.resolve(logo_url.replace("/projects/", "").lstrip("/"), PROJECT_ROOT)
 
-        if os.path.isfile(logo_path):
-            logo = Image(logo_path, 40, 40)
+        if logo_path:
+            compact = fastpdf.compact(metadata)
+            logo = fastpdf.shared(
+                cache, ("logo", logo_path, compact),
+                lambda: Image(logos.for_pdf(logo_path, compact), 40, 40),
+            )
 
     # -------- HEADER --------
     header = Table(
         [
             [
-                Paragraph(
+                fastpdf.shared(cache, ("company", company), lambda: Paragraph(
                     f"<b><font color='#0d6efd'>{company}</font></b>",
-                    ParagraphStyle("h", fontSize=14)
-                ),
+                    styles["company"]
+                )),
                 logo,
             ],
             [
-                Paragraph(
+                fastpdf.shared(cache, ("contact", email, phone), lambda: Paragraph(
                     f"<font color='black'>{email} | {phone}</font>",
-                    ParagraphStyle("e", fontSize=9)
-                ),
+                    styles["contact"]
+                )),
                 "",
             ],
         ],
@@ -117,43 +133,75 @@ def export_to_pdf(text, metadata=None):
     # -------- BLUE LINE --------
     elements.append(
         Table([[""]], colWidths=[170 * mm],
-              style=[("LINEBELOW", (0, 0), (-1, -1), 2, BLUE)])
+              style=[("LINEBELOW", (0, 0), (-1, -1), 2, HexColor(BLUE))])
     )
     elements.append(Spacer(1, 15))
 
     # -------- TITLE --------
-    elements.append(Paragraph(
+    elements.append(fastpdf.P(
         "<b><font color='#0d6efd'>RESIGNATION LETTER</font></b>",
-        ParagraphStyle("title", fontSize=16, alignment=TA_CENTER)
+        styles["title"]
     ))
     elements.append(Spacer(1, 20))
 
     # -------- BODY --------
-    body = ParagraphStyle("body", fontSize=11, leading=15)
     for line in text.split("\n"):
         if line.strip():
-            elements.append(Paragraph(line, body))
+            elements.append(fastpdf.P(line, styles["body"]))
             elements.append(Spacer(1, 6))
 
     # -------- SIGNATURE --------
     elements.append(Spacer(1, 40))
-    elements.append(Paragraph(
+    elements.append(fastpdf.P(
         "<font color='#FFD700'><b>Signature : _________________________</b></font>",
-        ParagraphStyle("sig", alignment=TA_RIGHT)
+        styles["signature"]
     ))
 
-    doc.build(elements, onFirstPage=draw_watermark, onLaterPages=draw_watermark)
-    return path
+    return elements, draw_watermark
+
+
+def export_to_pdf(text, metadata=None, output=None):
+    path = os.path.join(EXPORT_PDF, "resignation_letter.pdf")
+
+    if output is None and os.path.exists(path):
+        os.remove(path)
+
+    doc = _pdf_doc(output or path)
+    elements, on_page = _pdf_story(text, metadata, _pdf_styles())
+    fastpdf.build(doc, elements, onFirstPage=on_page, onLaterPages=on_page)
+    return output or path
+
+
+def export_batch_pdf(letters, output=None, outline=True):
+    # letters : [(texte, metadata)] -> un seul PDF, une lettre par page,
+    # un signet par salarié (outline=False : sans signets)
+    path = os.path.join(EXPORT_PDF, "resignation_letters.pdf")
+
+    if output is None and os.path.exists(path):
+        os.remove(path)
+
+    doc = _pdf_doc(output or path)
+    styles, cache = _pdf_styles(), {}
+    batch = []
+    for text, metadata in letters:
+        elements, on_page = _pdf_story(text, metadata, styles, cache)
+        batch.append(((metadata or {}).get("employee_full_name", ""), elements, on_page))
+    fastpdf.build_batch(doc, batch, outline=outline)
+    return output or path
 
 
 # ==============================
 #        WORD EXPORT
 # ==============================
-def export_to_word(text, metadata=None):
+def export_to_word(text, metadata=None, output=None):
+    from docx import Document
+    from docx.shared import Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
     metadata = metadata or {}
     path = os.path.join(EXPORT_WORD, "resignation_letter.docx")
 
-    if os.path.exists(path):
+    if output is None and os.path.exists(path):
         os.remove(path)
 
     doc = Document()
@@ -183,5 +231,5 @@ def export_to_word(text, metadata=None):
     p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
     p.runs[0].font.bold = True
 
-    doc.save(path)
-    return path
+    doc.save(output or path)
+    return output or path
@@ -0,0 +1,216 @@
+import importlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+
+from werkzeug.exceptions import GatewayTimeout, ServiceUnavailable
+
+# ================= PDF RENDER POOL (OPT-IN) =================
+# doc.build() de ReportLab est du Python pur qui garde le GIL : avec
+# LETTRIX_RENDER_WORKERS > 0, les exports sont rendus dans des process
+# dédiés (spawn, ReportLab préchargé). Le worker HTTP n'envoie que
+# (exporteur, texte, métadonnées) et reçoit les octets du document.
+# Un job trop long tue son process (remplacé au prochain usage) ; chaque
+# process est recyclé après MAX_JOBS rendus pour borner sa mémoire.
+
+POOL_SIZE = int(os.environ.get("LETTRIX_RENDER_WORKERS", "0"))   # 0 = rendu en ligne
+MAX_JOBS = int(os.environ.get("LETTRIX_RENDER_MAX_JOBS", "200"))
+RENDER_TIMEOUT = float(os.environ.get("LETTRIX_RENDER_TIMEOUT", "30"))
+ACQUIRE_TIMEOUT = 5.0   # attente max d'un process libre avant 503
+
+PRELOAD = (
+    "reportlab.platypus",
+    "reportlab.lib.styles",
+    "reportlab.lib.colors",
+    "reportlab.lib.utils",
+    "reportlab.pdfgen.canvas",
+)
+
+STATS = {"jobs": 0, "timeouts": 0, "errors": 0, "recycled": 0, "spawned": 0}
+
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        STATS[key] += 1
+
+
+class RenderBusy(ServiceUnavailable):
+    description = "All render workers are busy, please retry."
+
+
+class RenderTimeout(GatewayTimeout):
+    description = "Rendering took too long."
+
+
+class RenderError(RuntimeError):
+    pass
+
+
+# ----- exporteur désigné par "module:fonction" (sérialisable) -----
+def target_of(func):
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def resolve(target):
+    module, attr = target.split(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+# ----- côté process de rendu -----
+
+
+def _worker_main(conn, max_jobs):
+    for name in PRELOAD:
+        importlib.import_module(name)
+    done = 0
+    while done < max_jobs:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        target, args, kwargs = job
+        try:
+            out = io.BytesIO()
+            resolve(target)(*args, output=out, **kwargs)
+            conn.send(("ok", out.getvalue()))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        done += 1
+    conn.close()
+
+
+# ----- côté worker HTTP -----
+class _Worker:
+    def __init__(self, ctx, max_jobs):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child, max_jobs), name="render-worker", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.jobs = 0
+        _count("spawned")
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def retire(self):
+        # le process sort de lui-même après max_jobs ; sinon on le termine
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class RenderPool:
+    def __init__(self, size=POOL_SIZE, max_jobs=MAX_JOBS, timeout=RENDER_TIMEOUT):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.LifoQueue()
+
+    def start(self):
+        # tous les process démarrent (et préchargent ReportLab) en parallèle
+        for _ in range(self.size):
+            self._idle.put(_Worker(self._ctx, self.max_jobs))
+        return self
+
+    def render(self, target, args=(), kwargs=None):
+        try:
+            worker = self._idle.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise RenderBusy()
+        try:
+            if worker is None or not worker.alive():
+                if worker is not None:
+                    worker.kill()
+                worker = _Worker(self._ctx, self.max_jobs)
+            worker.conn.send((target, args, kwargs or {}))
+            worker.jobs += 1
+            _count("jobs")
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                worker = None
+                _count("timeouts")
+                raise RenderTimeout()
+            status, payload = worker.conn.recv()
+            if worker.jobs >= self.max_jobs:
+                worker.retire()
+                worker = None
+                _count("recycled")
+        except (EOFError, OSError):
+            if worker is not None:
+                worker.kill()
+            worker = None
+            _count("errors")
+            raise RenderError("render worker died")
+        finally:
+            # None = place libre, un process neuf sera lancé au prochain job
+            self._idle.put(worker)
+        if status == "error":
+            _count("errors")
+            raise RenderError(payload)
+        return payload
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.kill()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def enabled():
+    return POOL_SIZE > 0
+
+
+def get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = RenderPool().start()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def warm():
+    # jamais depuis un process enfant (spawn ré-importe le module principal)
+    if enabled() and multiprocessing.current_process().name == "MainProcess":
+        get_pool()
+
+
+def render(func, *args, **kwargs):
+    # func : exporteur de module (export_to_pdf...) acceptant output=
+    if not enabled():
+        out = io.BytesIO()
+        func(*args, output=out, **kwargs)
+        return out.getvalue()
+    return get_pool().render(target_of(func), args, kwargs)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
@@ -0,0 +1,175 @@
+import glob
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:   # Windows : pas de verrou, seul le délai de grâce protège
+    fcntl = None
+
+# ================= EXPORT RETENTION =================
+# export/pdf et export/word (racine et mini-apps : job_application_app/
+# export/...) ne font que grossir : tout appel d'exporteur sans output=
+# y écrit un fichier horodaté. sweep() supprime ce qui n'a pas servi
+# depuis MAX_AGE puis tient l'ensemble sous MAX_BYTES (les moins
+# récemment utilisés d'abord).
+#
+# Aucune route ne sert plus ces fichiers (exports rendus en mémoire, voir
+# downloads.py). Un fichier modifié depuis moins de MIN_AGE n'est jamais
+# supprimé (export en cours d'écriture), et la suppression se fait sous
+# verrou exclusif (flock, un seul ménage à la fois entre workers) après une
+# nouvelle vérification de la date d'usage.
+#   python retention.py [--dry-run] [--max-age-days N] [--max-mb N]
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MAX_AGE = float(os.environ.get("LETTRIX_EXPORT_MAX_AGE_DAYS", "7")) * 24 * 3600
+MAX_BYTES = int(float(os.environ.get("LETTRIX_EXPORT_MAX_MB", "500")) * 1024 * 1024)
+MIN_AGE = 600              # secondes : jamais supprimé avant (écriture / envoi)
+INTERVAL = int(os.environ.get("LETTRIX_EXPORT_JANITOR_INTERVAL", "3600"))
+EXTENSIONS = (".pdf", ".docx")
+
+STATS = {"sweeps": 0, "files_deleted": 0, "bytes_reclaimed": 0, "busy": 0, "errors": 0,
+         "files": 0, "bytes": 0, "last_sweep": None}
+
+_stats_lock = threading.Lock()
+_sweep_lock = threading.Lock()
+
+
+def stats():
+    with _stats_lock:
+        return dict(STATS)
+
+
+def export_dirs(root=ROOT):
+    dirs = []
+    for sub in ("pdf", "word"):
+        dirs.append(os.path.join(root, "export", sub))
+        dirs.extend(sorted(glob.glob(os.path.join(root, "*", "export", sub))))
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def _last_used(st):
+    # lecture (atime, si le système le tient à jour) ou écriture / touch
+    return max(st.st_atime, st.st_mtime)
+
+
+def scan(dirs):
+    # -> [(dernier usage, octets, chemin)], du moins récent au plus récent
+    files = []
+    for d in dirs:
+        for entry in os.scandir(d):
+            if not entry.name.lower().endswith(EXTENSIONS):
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            files.append((_last_used(st), st.st_size, entry.path))
+    files.sort()
+    return files
+
+
+def _delete(path, last_used):
+    # -> True supprimé, False utilisé entre-temps (ou déjà parti)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return False
+    with f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False   # supprimé par le ménage d'un autre worker
+        st = os.fstat(f.fileno())
+        if st.st_nlink == 0 or _last_used(st) > last_used:
+            return False
+        os.remove(path)
+        return True
+
+
+def sweep(now=None, dry_run=False, max_age=None, max_bytes=None, dirs=None):
+    now = now or time.time()
+    max_age = MAX_AGE if max_age is None else max_age
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    files = scan(export_dirs() if dirs is None else dirs)
+    total = sum(size for _, size, _ in files)
+
+    # 1) trop vieux, 2) au-delà du quota : LRU ; jamais plus récent que MIN_AGE
+    expired = now - max(max_age, MIN_AGE)
+    victims = [f for f in files if f[0] < expired]
+    over = total - sum(size for _, size, _ in victims) - max_bytes
+    for f in files[len(victims):]:
+        if over <= 0 or f[0] >= now - MIN_AGE:
+            break
+        victims.append(f)
+        over -= f[1]
+
+    result = {"files_deleted": 0, "bytes_reclaimed": 0, "busy": 0, "errors": 0}
+    with _sweep_lock:
+        for last_used, size, path in victims:
+            if dry_run:
+                print("EXPORT RETENTION would delete:", path)
+                deleted = True
+            else:
+                try:
+                    deleted = _delete(path, last_used)
+                except OSError as e:
+                    print("EXPORT RETENTION ERROR:", path, e)
+                    result["errors"] += 1
+                    continue
+            if deleted:
+                result["files_deleted"] += 1
+                result["bytes_reclaimed"] += size
+            else:
+                result["busy"] += 1
+    result["files"] = len(files) - result["files_deleted"]
+    result["bytes"] = total - result["bytes_reclaimed"]
+
+    if not dry_run:
+        with _stats_lock:
+            STATS["sweeps"] += 1
+            for key in ("files_deleted", "bytes_reclaimed", "busy", "errors"):
+                STATS[key] += result[key]
+            STATS["files"], STATS["bytes"] = result["files"], result["bytes"]
+            STATS["last_sweep"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+    return result
+
+
+def start_janitor(interval=INTERVAL):
+    stop = threading.Event()
+
+    def run():
+        while True:
+            try:
+                sweep()
+            except Exception as e:
+                print("EXPORT RETENTION ERROR:", e)
+            if stop.wait(interval):
+                break
+
+    threading.Thread(target=run, name="export-retention", daemon=True).start()
+    return stop
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Delete old exports from export/pdf and export/word.")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be deleted")
+    parser.add_argument("--max-age-days", type=float, help=f"default {MAX_AGE / 86400:g}")
+    parser.add_argument("--max-mb", type=float, help=f"default {MAX_BYTES / 1024 / 1024:g}")
+    args = parser.parse_args()
+    result = sweep(
+        dry_run=args.dry_run,
+        max_age=None if args.max_age_days is None else args.max_age_days * 24 * 3600,
+        max_bytes=None if args.max_mb is None else int(args.max_mb * 1024 * 1024),
+    )
+    for d in export_dirs():
+        print("scanned:", os.path.relpath(d, ROOT))
+    print(f"{'would delete' if args.dry_run else 'deleted'} {result['files_deleted']} files "
+          f"({result['bytes_reclaimed']} bytes), {result['busy']} in use, {result['errors']} errors; "
+          f"{result['files']} files ({result['bytes']} bytes) kept")
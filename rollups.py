@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+
+# ================= DASHBOARD ROLLUPS =================
+# Agrégats matérialisés pour /admin : visites par jour (table visits),
+# par semaine ISO et par mois, plus des compteurs courants (commentaires).
+# Tenus à jour à l'écriture (flush des visites, insertion de commentaire) ;
+# refresh() les reconstruit depuis les tables de base.
+
+GRANULARITIES = ("day", "week", "month")
+
+TABLES = {
+    "day": ("visits", "visit_date"),
+    "week": ("visits_weekly", "period"),
+    "month": ("visits_monthly", "period"),
+}
+
+
+def init(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS visits_weekly (
+            period TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS visits_monthly (
+            period TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+# ----- clés de période -----
+def bucket(day, granularity):
+    if granularity == "day":
+        return day
+    d = date.fromisoformat(day)
+    if granularity == "week":
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    return d.strftime("%Y-%m")
+
+
+# ================= ÉCRITURE INCRÉMENTALE =================
+def record_visits(conn, batch):
+    # batch = {visit_date: delta}, déjà écrit dans visits par l'appelant
+    for granularity in ("week", "month"):
+        table, key = TABLES[granularity]
+        deltas = {}
+        for day, n in batch.items():
+            period = bucket(day, granularity)
+            deltas[period] = deltas.get(period, 0) + n
+        conn.executemany(
+            f"INSERT INTO {table} ({key}, count) VALUES (?, ?) "
+            f"ON CONFLICT({key}) DO UPDATE SET count = count + excluded.count",
+            sorted(deltas.items())
+        )
+
+
+def incr(conn, name, n=1):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, n)
+    )
+
+
+def counter(conn, name):
+    row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+    return row["value"] if row else 0
+
+
+# ================= RECONSTRUCTION =================
+def refresh(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("SELECT visit_date, count FROM visits").fetchall()
+        conn.execute("DELETE FROM visits_weekly")
+        conn.execute("DELETE FROM visits_monthly")
+        record_visits(conn, {row["visit_date"]: row["count"] for row in rows})
+        total = conn.execute("SELECT COUNT(*) AS total FROM comments").fetchone()["total"]
+        conn.execute(
+            "INSERT OR REPLACE INTO counters (name, value) VALUES ('comments', ?)",
+            (total,)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def ensure_built(conn):
+    # premier démarrage : les rollups n'existent pas encore
+    row = conn.execute("SELECT 1 FROM counters WHERE name = 'comments'").fetchone()
+    if row is None:
+        refresh(conn)
+
+
+# ================= LECTURE =================
+def default_range(granularity, today=None):
+    today = today or date.today()
+    days = {"day": 30, "week": 7 * 12, "month": 365}[granularity]
+    return (today - timedelta(days=days)).isoformat(), today.isoformat()
+
+
+def query(conn, granularity, start, end):
+    # une seule lecture indexée (clé primaire) quel que soit l'historique
+    table, key = TABLES[granularity]
+    rows = conn.execute(
+        f"SELECT {key} AS period, count FROM {table} "
+        f"WHERE {key} BETWEEN ? AND ? ORDER BY {key}",
+        (bucket(start, granularity), bucket(end, granularity))
+    ).fetchall()
+    return [{"visit_date": row["period"], "count": row["count"]} for row in rows]
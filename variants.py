@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import random
+import string
+import threading
+import time
+
+# ================= LETTER VARIANT REGISTRY =================
+# Les corpus de lettres (intro.txts, body.txts, conclusion.txts...) sont
+# chargés une fois par worker et gardés en tuples immuables. Les mtimes
+# sont revérifiés au plus toutes les CHECK_INTERVAL secondes : une
+# modification des fichiers est prise en compte sans redémarrage, et
+# generate_text ne fait aucune lecture disque.
+
+CHECK_INTERVAL = 3.0
+SEPARATOR = "\n---\n"
+EXTENSION = ".txts"
+
+
+# politique pour les champs absents du formulaire
+KEEP = "keep"     # laisse "{champ}" dans le texte (comme l'ancien SafeDict)
+BLANK = "blank"   # remplace par une chaîne vide
+
+_formatter = string.Formatter()
+
+
+def parse_variants(text):
+    return tuple(p.strip() for p in text.split(SEPARATOR) if p.strip())
+
+
+# ================= PRECOMPILED VARIANTS =================
+# Chaque variante est découpée une seule fois (string.Formatter.parse) en
+# segments (texte littéral, champ, conversion, format) ; le rendu n'est
+# plus qu'un join, sans re-parser ni copier le formulaire dans un SafeDict.
+
+class CompiledVariant:
+    __slots__ = ("source", "segments", "fields")
+
+    def __init__(self, source):
+        self.source = source
+        segments = []
+        fields = set()
+        for literal, field, spec, conversion in _formatter.parse(source):
+            if field is not None:
+                fields.add(field)
+            segments.append((literal, field, conversion, spec))
+        self.segments = tuple(segments)
+        # champs du formulaire dont la variante a besoin
+        self.fields = frozenset(fields)
+
+    def render(self, values, missing=KEEP):
+        out = []
+        for literal, field, conversion, spec in self.segments:
+            out.append(literal)
+            if field is None:
+                continue
+            if field not in values:
+                out.append("{" + field + "}" if missing == KEEP else "")
+                continue
+            value = values[field]
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            out.append(format(value, spec) if spec else str(value))
+        return "".join(out)
+
+    def __repr__(self):
+        return f"CompiledVariant({self.source[:40]!r})"
+
+
+def compile_variants(variants):
+    return tuple(CompiledVariant(v) for v in variants)
+
+
+def fields_of(*variants):
+    needed = set()
+    for variant in variants:
+        needed |= variant.fields
+    return needed
+
+
+# ================= SEEDED SELECTION =================
+# Le choix des variantes dépend d'une graine explicite : par défaut un hash
+# du formulaire normalisé (même formulaire -> même lettre), sinon le champ
+# "seed" du formulaire. Les indices choisis sont renvoyés avec le texte ;
+# "variant_indices" (ex. "2,0,1") force ces indices pour reproduire une lettre.
+
+SEED_EXCLUDED = frozenset((
+    "seed", "variant_indices", "generated_text", "company_logo", "company_logo_path",
+))
+
+
+def derive_seed(info):
+    normalized = {
+        k: str(v).strip() for k, v in info.items()
+        if k not in SEED_EXCLUDED and v is not None and str(v).strip()
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return int.from_bytes(hashlib.sha256(payload.encode("utf-8")).digest()[:8], "big")
+
+
+def resolve_seed(info):
+    raw = str(info.get("seed") or "").strip()
+    if raw.isdigit():
+        return int(raw)
+    if raw:
+        return int.from_bytes(hashlib.sha256(raw.encode("utf-8")).digest()[:8], "big")
+    return derive_seed(info)
+
+
+def parse_indices(value):
+    try:
+        return [int(p) for p in str(value or "").split(",") if p.strip()]
+    except ValueError:
+        return []
+
+
+def select_variants(sections, info):
+    # sections : [(nom, variantes), ...] dans un ordre fixe
+    seed = resolve_seed(info)
+    forced = parse_indices(info.get("variant_indices"))
+    rng = random.Random(seed)
+    chosen, indices = {}, {}
+    for pos, (name, variants) in enumerate(sections):
+        if not variants:
+            chosen[name], indices[name] = None, None
+            continue
+        i = rng.randrange(len(variants))
+        if pos < len(forced) and 0 <= forced[pos] < len(variants):
+            i = forced[pos]
+        chosen[name], indices[name] = variants[i], i
+    return chosen, indices, seed
+
+
+def format_indices(indices):
+    return ",".join("" if i is None else str(i) for i in indices.values())
+
+
+class VariantRegistry:
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._corpora = {}   # dossier -> {fichier: (mtime_ns, variantes, compilées)}
+        self._checked = {}   # dossier -> dernier contrôle (monotonic)
+        self._lock = threading.Lock()
+
+    def _scan(self, directory, previous):
+        corpus = {}
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return corpus
+        for entry in entries:
+            if not entry.name.endswith(EXTENSION) or not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime_ns
+            old = previous.get(entry.name)
+            if old and old[0] == mtime:
+                corpus[entry.name] = old
+                continue
+            with open(entry.path, encoding="utf-8") as f:
+                variants = parse_variants(f.read())
+            corpus[entry.name] = (mtime, variants, compile_variants(variants))
+        return corpus
+
+    def _refresh(self, directory, now):
+        with self._lock:
+            if now - self._checked.get(directory, float("-inf")) < self.check_interval:
+                return self._corpora[directory]
+            corpus = self._scan(directory, self._corpora.get(directory, {}))
+            # remplacement atomique : les lecteurs ne prennent jamais le verrou
+            self._corpora[directory] = corpus
+            self._checked[directory] = now
+            return corpus
+
+    def corpus(self, directory):
+        now = time.monotonic()
+        if now - self._checked.get(directory, float("-inf")) >= self.check_interval:
+            return self._refresh(directory, now)
+        return self._corpora[directory]
+
+    def get(self, directory, filename):
+        entry = self.corpus(directory).get(filename)
+        return entry[1] if entry else ()
+
+    def compiled(self, directory, filename):
+        entry = self.corpus(directory).get(filename)
+        return entry[2] if entry else ()
+
+    def preload(self, directory):
+        self.corpus(directory)
+        return self
+
+
+registry = VariantRegistry()
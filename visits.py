@@ -0,0 +1,174 @@
+import atexit
+import threading
+from datetime import date
+
+import rollups
+from hll import HyperLogLog
+
+# ================= WRITE-BEHIND VISIT COUNTER =================
+# Les hits sont agrégés en mémoire par jour puis écrits en lot
+# (un seul UPSERT) toutes les FLUSH_INTERVAL secondes ou tous les
+# FLUSH_EVERY hits, au lieu d'un aller-retour SQLite par requête. Le
+# flush se fait toujours dans le thread visits-flush (réveillé au
+# FLUSH_EVERY-ième hit), jamais dans la requête.
+# Les visiteurs uniques suivent le même chemin : un sketch HyperLogLog
+# par jour en mémoire, fusionné (max des registres) avec le blob stocké
+# au moment du flush, donc combiné entre tous les workers.
+
+FLUSH_INTERVAL = 5.0
+FLUSH_EVERY = 200
+
+UPSERT_SQL = """
+    INSERT INTO visits (visit_date, count) VALUES (?, ?)
+    ON CONFLICT(visit_date) DO UPDATE SET count = count + excluded.count
+"""
+
+SKETCH_UPSERT_SQL = """
+    INSERT INTO visitor_sketches (visit_date, sketch) VALUES (?, ?)
+    ON CONFLICT(visit_date) DO UPDATE SET sketch = excluded.sketch
+"""
+
+
+def init(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS visitor_sketches (
+            visit_date TEXT PRIMARY KEY,
+            sketch BLOB NOT NULL
+        )
+    """)
+
+
+def load_sketch(conn, day):
+    row = conn.execute(
+        "SELECT sketch FROM visitor_sketches WHERE visit_date = ?", (day,)
+    ).fetchone()
+    return HyperLogLog(row["sketch"]) if row else HyperLogLog()
+
+
+class VisitCounter:
+    def __init__(self, connect, flush_interval=FLUSH_INTERVAL, flush_every=FLUSH_EVERY):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._pending = {}
+        self._sketches = {}
+        self._dirty = set()
+        self._hits = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def hit(self, day=None, visitor=None):
+        day = day or date.today().isoformat()
+        with self._lock:
+            self._pending[day] = self._pending.get(day, 0) + 1
+            if visitor:
+                sketch = self._sketches.get(day)
+                if sketch is None:
+                    sketch = self._sketches[day] = HyperLogLog()
+                if sketch.add(visitor):
+                    self._dirty.add(day)
+            self._hits += 1
+            due = self._hits >= self.flush_every
+        if due:
+            if self._thread is None:
+                self.flush()
+            else:
+                self._wake.set()
+
+    def pending(self, day=None):
+        day = day or date.today().isoformat()
+        with self._lock:
+            return self._pending.get(day, 0)
+
+    def pending_all(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        # un seul flush à la fois ; les hits continuent d'arriver pendant l'écriture
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                dirty, self._dirty = self._dirty, set()
+                sketches = {day: self._sketches[day].copy() for day in dirty}
+                self._hits = 0
+            if not batch and not dirty:
+                return 0
+            conn = None
+            try:
+                conn = self.connect()
+                # verrou d'écriture dès le début : lecture-fusion-écriture des sketches
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(UPSERT_SQL, sorted(batch.items()))
+                rollups.record_visits(conn, batch)
+                for day, sketch in sketches.items():
+                    sketch.merge(load_sketch(conn, day))
+                    conn.execute(SKETCH_UPSERT_SQL, (day, sketch.to_bytes()))
+                conn.commit()
+            except Exception as e:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+                # on remet les deltas en attente pour le prochain flush
+                with self._lock:
+                    for day, n in batch.items():
+                        self._pending[day] = self._pending.get(day, 0) + n
+                    self._dirty |= dirty
+                print("VISITS FLUSH ERROR:", e)
+                return 0
+            # on garde la vue fusionnée du jour, on libère les jours passés
+            today = date.today().isoformat()
+            with self._lock:
+                for day, sketch in sketches.items():
+                    if day in self._sketches:
+                        self._sketches[day].merge(sketch)
+                for day in list(self._sketches):
+                    if day != today and day not in self._dirty:
+                        del self._sketches[day]
+            return sum(batch.values())
+
+    # ----- fusion lecture : base + deltas non encore écrits -----
+    def today(self, stored):
+        return stored + self.pending()
+
+    def unique(self, conn, day=None):
+        day = day or date.today().isoformat()
+        sketch = load_sketch(conn, day)
+        with self._lock:
+            local = self._sketches.get(day)
+            if local is not None:
+                sketch.merge(local)
+        return sketch.count()
+
+    def merge(self, rows, granularity="day", start=None, end=None):
+        counts = {row["visit_date"]: row["count"] for row in rows}
+        for day, n in self.pending_all().items():
+            if (start and day < start) or (end and day > end):
+                continue
+            period = rollups.bucket(day, granularity)
+            counts[period] = counts.get(period, 0) + n
+        return [{"visit_date": d, "count": counts[d]} for d in sorted(counts)]
+
+    # ----- thread de flush périodique -----
+    def _run(self):
+        # timer ou réveil par hit() quand FLUSH_EVERY hits sont en attente
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="visits-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self.flush()